@@ -431,8 +431,8 @@ export interface AIChatMessage {
 
 /**
  * Stream a response from LifeForge AI.
- * Calls the backend /ai/chat endpoint which proxies to Gemini.
- * Returns a ReadableStream reader or falls back to sync.
+ * Calls the backend /ai/chat endpoint which proxies to Groq and
+ * streams the reply back as Server-Sent Events.
  */
 export async function streamAIChat(
     messages: AIChatMessage[],
@@ -477,12 +477,26 @@ export async function streamAIChat(
             return;
         }
 
+        // Server-Sent Events: `data: {"token": "..."}` frames, ending with `data: {"done": true}`
         const decoder = new TextDecoder();
-        while (true) {
+        let buffer = "";
+        let finished = false;
+        while (!finished) {
             const { done, value } = await reader.read();
             if (done) break;
-            const text = decoder.decode(value, { stream: true });
-            onChunk(text);
+            buffer += decoder.decode(value, { stream: true });
+
+            let sep: number;
+            while ((sep = buffer.indexOf("\n\n")) !== -1) {
+                const frame = buffer.slice(0, sep);
+                buffer = buffer.slice(sep + 2);
+                for (const line of frame.split("\n")) {
+                    if (!line.startsWith("data:")) continue;
+                    const event = JSON.parse(line.slice(5).trim());
+                    if (event.token) onChunk(event.token);
+                    if (event.done) finished = true;
+                }
+            }
         }
         onDone();
     } catch (err: any) {
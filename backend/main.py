@@ -3,61 +3,240 @@ LifeForge Connect — FastAPI Backend
 ------------------------------------
 Run locally:
     uvicorn main:app --reload --port 8001
+
+Run in production (see Procfile):
+    uvicorn main:app --host 0.0.0.0 --port $PORT --workers 4 --loop uvloop --http httptools
+
+Each worker opens its own asyncpg pool, so keep PG_POOL_MAX × workers within
+the database / pooler connection limit.
 """
 
-from fastapi import FastAPI
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import anyio
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import MutableHeaders
 
+from utils.db import get_supabase_client, create_pg_pool
 from routes import auth, blood, thal, platelet, marrow, organ, milk, dashboard, notifications, ai_chat
 
+logger = logging.getLogger(__name__)
+supabase = get_supabase_client()
+
+# Upper bound on threads per worker for blocking work — both sync `def`
+# endpoints (anyio's limiter) and our own asyncio.to_thread calls (the loop's
+# default executor). Bursts queue instead of spawning more OS threads.
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "8"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=THREADPOOL_SIZE, thread_name_prefix="fastapi")
+    )
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+    app.state.pg = await create_pg_pool()
+
+    # Warm up before accepting traffic so the first visitor doesn't pay for
+    # the cold fetch. Non-fatal — /stats fetches on demand if this fails.
+    try:
+        await _refresh_stats(app.state.pg)
+    except Exception as e:
+        logger.warning(f"Stats warm-up failed: {e}")
+
+    try:
+        yield
+    finally:
+        if app.state.pg is not None:
+            await app.state.pg.close()
+        await ai_chat.close_client()
+
+
 app = FastAPI(
     title="LifeForge Connect API",
     description="Backend for the LifeForge Connect donation platform",
     version="2.0.0",
+    lifespan=lifespan,
 )
 
 # ── CORS ──────────────────────────────────────────────────────────────────────
 app.add_middleware(
     CORSMiddleware,
-    allow_origin_regex=r"http://localhost:\d+|http://127\.0\.0\.1:\d+|https://.*\.(vercel|netlify)\.app",
+    allow_origin_regex=r"^(?:http://localhost:\d+|http://127\.0\.0\.1:\d+|https://[a-z0-9-]+(?:\.[a-z0-9-]+)*\.(?:vercel|netlify)\.app)$",
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"],     
+    allow_headers=["*"],
 )
 
 # ── Routers ───────────────────────────────────────────────────────────────────
-app.include_router(auth.router,          prefix="/auth",          tags=["Auth"])
-app.include_router(blood.router,         prefix="/blood",         tags=["BloodBridge"])
-app.include_router(thal.router,          prefix="/thal",          tags=["ThalCare"])
-app.include_router(platelet.router,      prefix="/platelet",      tags=["PlateletAlert"])
-app.include_router(marrow.router,        prefix="/marrow",        tags=["MarrowMatch"])
-app.include_router(organ.router,         prefix="/organ",         tags=["LastGift"])
-app.include_router(milk.router,          prefix="/milk",          tags=["MilkBridge"])
-app.include_router(dashboard.router,     prefix="/dashboard",     tags=["Dashboard"])
-app.include_router(notifications.router, prefix="/notifications", tags=["Notifications"])
-app.include_router(ai_chat.router,       prefix="/ai",            tags=["AI Companion"])
+ROUTERS = (
+    (auth,          "/auth",          "Auth"),
+    (blood,         "/blood",         "BloodBridge"),
+    (thal,          "/thal",          "ThalCare"),
+    (platelet,      "/platelet",      "PlateletAlert"),
+    (marrow,        "/marrow",        "MarrowMatch"),
+    (organ,         "/organ",         "LastGift"),
+    (milk,          "/milk",          "MilkBridge"),
+    (dashboard,     "/dashboard",     "Dashboard"),
+    (notifications, "/notifications", "Notifications"),
+    (ai_chat,       "/ai",            "AI Companion"),
+)
+
+for module, prefix, tag in ROUTERS:
+    app.include_router(module.router, prefix=prefix, tags=[tag])
+
+
+# ── Request Timing ────────────────────────────────────────────────────────────
+class RequestTimingMiddleware:
+    """
+    Per-router latency, reported once here instead of in every handler.
+
+    Plain ASGI rather than @app.middleware("http"): streamed bodies (the /ai/chat
+    SSE stream) pass straight through, and the timer stops on the final body
+    message, so the logged time covers the whole response. Server-Timing goes
+    out with the headers, so it carries time-to-headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", f"app;dur={(time.perf_counter() - start) * 1000:.1f}")
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                if logger.isEnabledFor(logging.DEBUG):
+                    path = scope["path"]
+                    logger.debug(
+                        "%s %s %s %d %.1fms",
+                        "/" + path.lstrip("/").split("/", 1)[0], scope["method"], path, status,
+                        (time.perf_counter() - start) * 1000,
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_timed)
+
+
+app.add_middleware(RequestTimingMiddleware)
 
 
 # ── Health Check ──────────────────────────────────────────────────────────────
 @app.get("/", tags=["Health"])
-def root():
+def root(response: Response):
+    response.headers["Cache-Control"] = "public, max-age=300"
     return {"status": "ok", "service": "LifeForge Connect API v2.0"}
 
 
-@app.get("/stats", tags=["Health"])
-def platform_stats():
-    """Live platform stats used by Index.tsx LiveCounter widgets."""
-    from utils.db import supabase
+# ── Platform Stats ────────────────────────────────────────────────────────────
+# LiveCounter widgets call /stats on every page load. The counters only need to
+# be roughly live, so results are served from memory for STATS_TTL_SECONDS and
+# concurrent callers during a miss share a single upstream fetch.
+STATS_TTL_SECONDS = 60.0
+STATS_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=60"
+
+_stats_cache: dict = {"value": None, "expires": 0.0}
+_stats_lock = asyncio.Lock()
+_stats_inflight: Optional[asyncio.Future] = None
 
-    donors    = supabase.table("donors").select("id", count="exact").eq("is_available", True).execute()
-    hospitals = supabase.table("hospitals").select("id", count="exact").execute()
-    matches   = supabase.table("matches").select("id", count="exact").execute()
+_STATS_SQL = """
+    select
+      (select count(*) from donors where is_available) as donors,
+      (select greatest(reltuples, 0)::bigint from pg_class where oid = 'public.hospitals'::regclass) as hospitals,
+      (select greatest(reltuples, 0)::bigint from pg_class where oid = 'public.matches'::regclass) as matches
+"""
 
-    total_matches = matches.count or 0
+
+async def _fetch_stats_rest() -> dict:
+    try:
+        res = await asyncio.to_thread(supabase.rpc("platform_stats_estimate").execute)
+        return (res.data or [{}])[0]
+    except Exception as e:
+        # RPC not deployed yet (schema.sql not re-run) — fall back to the three
+        # exact counts, issued concurrently so latency is max(t) rather than sum(t)
+        logger.warning(f"platform_stats_estimate RPC unavailable, using COUNT fallback: {e}")
+        donors, hospitals, matches = await asyncio.gather(
+            asyncio.to_thread(supabase.table("donors").select("id", count="exact").eq("is_available", True).execute),
+            asyncio.to_thread(supabase.table("hospitals").select("id", count="exact").execute),
+            asyncio.to_thread(supabase.table("matches").select("id", count="exact").execute),
+        )
+        return {"donors": donors.count, "hospitals": hospitals.count, "matches": matches.count}
+
+
+async def _fetch_stats(pg) -> dict:
+    if pg is not None:
+        async with pg.acquire() as conn:
+            row = dict(await conn.fetchrow(_STATS_SQL))
+    else:
+        row = await _fetch_stats_rest()
+
+    total_matches = row.get("matches") or 0
 
     return {
         "matches_today":        total_matches,
         "lives_impacted":       total_matches * 2,
-        "active_donors_online": donors.count or 0,
-        "hospitals_connected":  hospitals.count or 0,
-    }
\ No newline at end of file
+        "active_donors_online": row.get("donors") or 0,
+        "hospitals_connected":  row.get("hospitals") or 0,
+    }
+
+
+async def _refresh_stats(pg) -> dict:
+    value = await _fetch_stats(pg)
+    _stats_cache["value"]   = value
+    _stats_cache["expires"] = time.monotonic() + STATS_TTL_SECONDS
+    return value
+
+
+@app.get("/stats", tags=["Health"])
+async def platform_stats(request: Request, response: Response):
+    """Live platform stats used by Index.tsx LiveCounter widgets."""
+    global _stats_inflight
+
+    # Lets a CDN / the browser absorb most LiveCounter refreshes
+    response.headers["Cache-Control"] = STATS_CACHE_CONTROL
+
+    if time.monotonic() < _stats_cache["expires"]:
+        return _stats_cache["value"]
+
+    async with _stats_lock:
+        if time.monotonic() < _stats_cache["expires"]:
+            return _stats_cache["value"]
+        inflight = _stats_inflight
+        is_leader = inflight is None
+        if is_leader:
+            inflight = _stats_inflight = asyncio.get_running_loop().create_future()
+
+    if not is_leader:
+        # Another request is already fetching — wait for its result
+        return await asyncio.shield(inflight)
+
+    try:
+        value = await _refresh_stats(request.app.state.pg)
+    except Exception as exc:
+        inflight.set_exception(exc)
+        inflight.exception()   # mark retrieved so an unawaited failure isn't logged twice
+        raise
+    else:
+        inflight.set_result(value)
+        return value
+    finally:
+        if not inflight.done():
+            inflight.cancel()
+        _stats_inflight = None
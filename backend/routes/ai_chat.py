@@ -1,18 +1,28 @@
 """
 routes/ai_chat.py
 -----------------
-POST /ai/chat  → Streams a response from Groq (Llama 3.3 70B) for LifeForge AI Companion.
+POST /ai/chat  → Streams a response from Groq (Llama 3.3 70B) for LifeForge AI Companion
+                 as Server-Sent Events: `data: {"token": ...}` frames, then `data: {"done": true}`.
 """
 
 import os
+import re
+import time
+import asyncio
+import json
+import hashlib
 import logging
+from collections import deque
 from typing import List, Optional
 
+import httpx
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from groq import Groq
+from groq import AsyncGroq, RateLimitError
+
+from utils.cache import TTLCache
 
 # Ensure .env is loaded before reading keys
 _backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -29,12 +39,32 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 if not GROQ_API_KEY:
     logger.warning("GROQ_API_KEY not set — AI companion will be unavailable")
 
-client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
+# One pooled HTTP client per worker, so concurrent chats reuse keep-alive
+# connections to Groq instead of paying a TCP + TLS handshake each time.
+_http = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=httpx.Timeout(60.0, connect=5.0),
+)
+
+client = AsyncGroq(api_key=GROQ_API_KEY, http_client=_http) if GROQ_API_KEY else None
+
+
+async def close_client() -> None:
+    """Close the pooled Groq connections (called on app shutdown)."""
+    await _http.aclose()
 
 MODEL = "llama-3.3-70b-versatile"
 FALLBACK_MODELS = ["llama-3.1-8b-instant", "gemma2-9b-it"]
 
+# Urgent turns (emergency detection) only need the short "call 108" style
+# answer — cap the length and keep it near-deterministic.
+GENERATION_PARAMS = {"temperature": 0.7, "max_tokens": 2048}
+URGENT_GENERATION_PARAMS = {"temperature": 0.2, "max_tokens": 256}
+
 # ── System prompt — the brain of LifeForge AI ────────────────────────────────
+# Sent verbatim as the first message of every request so the provider can reuse
+# its cached prefill across turns. Keep it byte-identical: no f-strings,
+# timestamps or per-user values in here.
 
 SYSTEM_PROMPT = """You are **LifeForge AI**, the intelligent companion built into LifeForge Connect — India's unified life-saving donor-recipient platform.
 
@@ -163,6 +193,18 @@ You may answer general health questions related to:
 • Format nicely with line breaks and emojis where appropriate for readability.
 """
 
+# Canned refusal — must stay identical to the one quoted in SYSTEM_PROMPT
+OFF_TOPIC_REPLY = """I'm LifeForge AI, specialized exclusively in donation and health topics. I can help you with:
+• 🩸 Blood donation questions
+• ⚡ Platelet donation
+• 🧬 Bone marrow matching
+• 🫀 Organ donation
+• 🍼 Human milk banking
+• 🔴 Thalassemia care
+• 🏥 Donor health & eligibility
+
+Please ask me something related to these topics! 😊"""
+
 # ── Request / Response models ─────────────────────────────────────────────────
 
 class ChatMessage(BaseModel):
@@ -177,79 +219,415 @@ class ChatRequest(BaseModel):
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
-def _build_messages(messages: List[ChatMessage]):
-    """Convert chat history to Groq / OpenAI-compatible message list."""
-    out = [{"role": "system", "content": SYSTEM_PROMPT}]
-    for msg in messages:
-        role = "user" if msg.role == "user" else "assistant"
-        out.append({"role": role, "content": msg.content})
+# Built once — every request shares the same system message dict
+_SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+
+
+def _to_message(msg: ChatMessage) -> dict:
+    return {"role": "user" if msg.role == "user" else "assistant", "content": msg.content}
+
+
+# Prefill budget for the resent history. Llama tokenizers average ~4 chars per
+# token on English text, which is close enough for a cap without a tokenizer.
+MAX_HISTORY_TOKENS = 6000
+CHARS_PER_TOKEN    = 4
+
+
+def _trim_history(messages: List[ChatMessage]) -> List[ChatMessage]:
+    """Drop the oldest turns until the conversation fits MAX_HISTORY_TOKENS.
+
+    The latest message is always kept, and the kept history starts on a user
+    turn so a stray assistant reply never leads it.
+    """
+    budget = MAX_HISTORY_TOKENS * CHARS_PER_TOKEN
+    total = sum(len(m.content) for m in messages)
+    start = 0
+    while total > budget and start < len(messages) - 1:
+        total -= len(messages[start].content)
+        start += 1
+        while start < len(messages) - 1 and messages[start].role != "user":
+            total -= len(messages[start].content)
+            start += 1
+    return messages[start:]
+
+
+def _build_messages(messages: List[ChatMessage], dynamic_context: Optional[str] = None):
+    """Convert chat history to Groq / OpenAI-compatible message list.
+
+    Layout is always [system prompt] → [committed history] → [dynamic context]
+    → [latest turn], so everything before the per-request parts stays
+    byte-identical from one turn to the next and the cached prefix is reused.
+    History beyond MAX_HISTORY_TOKENS is dropped oldest-first.
+    """
+    messages = _trim_history(messages)
+    out = [_SYSTEM_MSG, *(_to_message(m) for m in messages[:-1])]
+    if dynamic_context:
+        out.append({"role": "system", "content": dynamic_context})
+    out.extend(_to_message(m) for m in messages[-1:])
     return out
 
 
-def _try_stream(messages_payload, models_to_try):
-    """Try streaming with fallback models. Returns (generator, error_str | None)."""
-    last_error = None
-    for model_name in models_to_try:
+def _sse(payload: dict) -> str:
+    """Encode one Server-Sent Events frame."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+_INTERRUPTED_FRAME = _sse({"token": "\n\n⚠️ Stream interrupted. Please try again."})
+
+
+# ── Off-topic short-circuit ───────────────────────────────────────────────────
+# A 70B pass just to emit OFF_TOPIC_REPLY is wasted work, but a false
+# "off-topic" refuses a real user. So only a small deny-list of clearly
+# unrelated asks (code, essays, trivia, homework) is answered locally, and
+# even those reach the model when the conversation mentions anything donation /
+# health related or is written in a non-Latin script (Hindi, Tamil, …).
+# Everything else goes to the model, which applies SYSTEM_PROMPT's scope rules.
+
+_OFF_TOPIC = re.compile(
+    r"```|"
+    r"\b(?:write|debug|fix|refactor|explain)\b.*\b(?:code|program|script|function|"
+    r"sql|regex|python|javascript|java|c\+\+|html|css)\b|"
+    r"\b(?:write|compose)\b.*\b(?:essay|poem|story|song|lyrics|article|speech)\b|"
+    r"\b(?:capital\s+of|who\s+won|world\s+cup|ipl|stock\s+price|bitcoin|crypto|"
+    r"movie|weather\s+in|translate|solve\s+for|derivative\s+of|integral\s+of)\b",
+    re.IGNORECASE,
+)
+
+_ON_TOPIC = re.compile(
+    r"\b(?:"
+    r"blood|platelet|plasma|marrow|stem\s*cell|hla|organ|kidney|liver|heart|lung|"
+    r"cornea|tissue|milk|breast|lactat|nicu|infant|baby|thal|h(?:a)?emoglobin|hb|"
+    r"ferritin|chelat|transfus|aphere|donat|donor|give|giving|recipient|pledge|"
+    r"compatib|group|(?:a|b|ab|o)\s*(?:[+-]|pos|neg|\+?ve\b|-ve\b)|positive|negative|"
+    r"eligib|an(?:a)?emi|iron|diet|food|eat|health|medic|doctor|hospital|"
+    r"emergenc|bleed|injur|accident|first\s*aid|infect|covid|vaccin|diabet|"
+    r"pregnan|tattoo|pierc|cancer|leuk(?:a)?emia|sickle|transplant|surgery|patient|"
+    r"khoon|daan|rakt|lifeforge|bloodbridge|plateletalert|marrowmatch|lastgift|"
+    r"milkbridge|thalcare"
+    r")"
+    r"|[^\x00-\u024f]",   # any non-Latin script → let the model handle it
+    re.IGNORECASE,
+)
+
+
+def _is_off_topic(messages: List[ChatMessage]) -> bool:
+    """True when the latest user turn is a clear off-topic ask (see _OFF_TOPIC)."""
+    user_turns = [m.content for m in messages if m.role == "user"]
+    if not user_turns or not _OFF_TOPIC.search(user_turns[-1]):
+        return False
+    if any(_ON_TOPIC.search(text) for text in user_turns):
+        return False
+    logger.info(f"Off-topic short-circuit: {user_turns[-1][:120]!r}")
+    return True
+
+
+# ── Response cache ────────────────────────────────────────────────────────────
+# Refusals and FAQ answers ("universal donor?", "108 emergency") repeat a lot;
+# serve exact repeats of a conversation from memory instead of re-running the
+# model. Keys include a hash of SYSTEM_PROMPT, so editing the prompt
+# invalidates every entry.
+
+RESPONSE_CACHE_SIZE = 4096
+REPLAY_CHUNK_CHARS  = 64
+
+_PROMPT_HASH = hashlib.blake2b(SYSTEM_PROMPT.encode(), digest_size=8).hexdigest()
+_WHITESPACE  = re.compile(r"\s+")
+_response_cache = TTLCache(RESPONSE_CACHE_SIZE)
+
+
+def _cache_key(messages: List[ChatMessage], is_urgent: bool = False) -> str:
+    """Hash of model + prompt + urgency + the normalised (lowercased, whitespace-collapsed) conversation."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{MODEL}\x00{_PROMPT_HASH}\x00{int(is_urgent)}".encode())
+    for m in messages:
+        text = _WHITESPACE.sub(" ", m.content).strip().lower()
+        h.update(f"\x00{m.role}\x00{text}".encode())
+    return h.hexdigest()
+
+
+def _cache_get(key: str) -> Optional[str]:
+    return _response_cache.get(key)
+
+
+def _cache_put(key: str, reply: str) -> None:
+    if reply:
+        _response_cache.put(key, reply)
+
+
+async def _replay(reply: str):
+    """Stream a cached reply in small chunks so the client UX is unchanged."""
+    for i in range(0, len(reply), REPLAY_CHUNK_CHARS):
+        yield _sse({"token": reply[i:i + REPLAY_CHUNK_CHARS]})
+    yield _sse({"done": True})
+
+
+# ── Primary-model token budget ────────────────────────────────────────────────
+# Groq caps tokens-per-minute per model. Track our own spend on MODEL over a
+# sliding minute and route straight to the fallback once it would overflow,
+# instead of sending the request anyway and eating a 429 round-trip first.
+#
+# GROQ_PRIMARY_TPM is the limit of the whole API key. The budget lives in each
+# uvicorn worker, so every worker gets an equal share; WEB_CONCURRENCY must
+# match the worker count (its default mirrors the Procfile's).
+
+KEY_PRIMARY_TPM       = int(os.getenv("GROQ_PRIMARY_TPM", "12000"))
+WORKER_COUNT          = max(1, int(os.getenv("WEB_CONCURRENCY", "4")))
+PRIMARY_TPM           = KEY_PRIMARY_TPM // WORKER_COUNT
+EXPECTED_REPLY_TOKENS = 512
+
+
+class _TokenBudget:
+    """Sliding one-minute window of estimated token spend."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.limit = tokens_per_minute
+        self.spent: deque = deque()    # (monotonic time, tokens)
+        self.total = 0
+
+    def _prune(self, now: float) -> None:
+        while self.spent and now - self.spent[0][0] >= 60.0:
+            self.total -= self.spent.popleft()[1]
+
+    def try_spend(self, tokens: int) -> bool:
+        now = time.monotonic()
+        self._prune(now)
+        if self.total + tokens > self.limit:
+            return False
+        self.spent.append((now, tokens))
+        self.total += tokens
+        return True
+
+    def exhaust(self) -> None:
+        """Provider said 429 — treat the rest of this window as used up."""
+        now = time.monotonic()
+        self._prune(now)
+        remaining = max(0, self.limit - self.total)
+        self.spent.append((now, remaining))
+        self.total += remaining
+
+
+_primary_budget = _TokenBudget(PRIMARY_TPM)
+
+
+def _models_for(messages_payload) -> List[str]:
+    """Model order for this request — skips MODEL when its budget is spent."""
+    prompt_chars = sum(len(m["content"]) for m in messages_payload)
+    estimate = prompt_chars // CHARS_PER_TOKEN + EXPECTED_REPLY_TOKENS
+    if _primary_budget.try_spend(estimate):
+        return [MODEL] + FALLBACK_MODELS
+    logger.info(f"{MODEL} token budget spent — routing to {FALLBACK_MODELS[0]}")
+    return list(FALLBACK_MODELS)
+
+
+async def _open_stream(model_name: str, messages_payload, params: dict):
+    """Start a streamed completion — the SDK raises here on auth / quota errors."""
+    logger.info(f"Trying model: {model_name}")
+    return await client.chat.completions.create(
+        model=model_name,
+        messages=messages_payload,
+        stream=True,
+        **params,
+    )
+
+
+async def _generate(stream, fallbacks, messages_payload, params: dict, cache_key: Optional[str]):
+    """Yield SSE frames from the stream. A rate limit hit before the first token
+    moves on to the next fallback model; a reply that completes is cached."""
+    parts = []
+    try:
+        while True:
+            try:
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta
+                    if delta and delta.content:
+                        parts.append(delta.content)
+                        yield _sse({"token": delta.content})
+                break
+            except RateLimitError as e:
+                if parts or not fallbacks:
+                    raise
+                logger.warning(f"Stream rate-limited before first token: {e}")
+                model_name, fallbacks = fallbacks[0], fallbacks[1:]
+                stream = await _open_stream(model_name, messages_payload, params)
+    except Exception as e:
+        logger.error(f"Stream error mid-response: {e}")
+        yield _INTERRUPTED_FRAME
+    else:
+        if cache_key:
+            _cache_put(cache_key, "".join(parts))
+    finally:
+        # Release the upstream HTTP response even when we stop early
         try:
-            logger.info(f"Trying model: {model_name}")
-            stream = client.chat.completions.create(
-                model=model_name,
-                messages=messages_payload,
-                temperature=0.7,
-                max_tokens=2048,
-                stream=True,
-            )
+            await stream.close()
+        except Exception:
+            pass
+    yield _sse({"done": True})
+
 
-            # Eagerly pull the first real token to surface auth / quota errors early
-            first_text = None
-            for chunk in stream:
-                delta = chunk.choices[0].delta
-                if delta and delta.content:
-                    first_text = delta.content
-                    break
-
-            def _generate():
-                if first_text:
-                    yield first_text
-                try:
-                    for chunk in stream:
-                        delta = chunk.choices[0].delta
-                        if delta and delta.content:
-                            yield delta.content
-                except Exception as e:
-                    logger.error(f"Stream error mid-response: {e}")
-                    yield "\n\n⚠️ Stream interrupted. Please try again."
-
-            return _generate(), None
+async def _try_stream(messages_payload, models_to_try, params: dict, cache_key: Optional[str] = None):
+    """Try streaming with fallback models. Returns (async generator, error | None).
 
+    Returns as soon as a model accepts the request — no token is awaited here,
+    so time-to-first-token is just the model's own. A reply that streams to
+    completion is stored under cache_key.
+    """
+    last_error = None
+    for i, model_name in enumerate(models_to_try):
+        try:
+            stream = await _open_stream(model_name, messages_payload, params)
+            return _generate(stream, models_to_try[i + 1:], messages_payload, params, cache_key), None
+
+        except RateLimitError as e:
+            logger.warning(f"Model {model_name} rate-limited: {e}")
+            last_error = e
+            if model_name == MODEL:
+                _primary_budget.exhaust()
         except Exception as e:
-            error_str = str(e)
-            logger.warning(f"Model {model_name} failed: {error_str}")
-            last_error = error_str
-            if "429" in error_str or "rate_limit" in error_str.lower():
-                continue
+            logger.warning(f"Model {model_name} failed: {e}")
+            last_error = e
             break
 
     return None, last_error
 
 
+# ── Request coalescing ────────────────────────────────────────────────────────
+# When identical conversations arrive together (e.g. right after a push
+# notification) only the first runs a model stream; the rest subscribe to its
+# SSE frames. Late joiners get the frames sent so far replayed first.
+#
+# The model stream is drained by its own task (_produce), and every response —
+# the one that started it included — is just a subscriber. A client that
+# disconnects therefore never cuts off the others, and the upstream stream is
+# always run to completion (or failure) and closed.
+
+COALESCE_MAX_FOLLOWERS = 32
+COALESCE_WINDOW_SECONDS = 60.0   # never join a group older than this (stuck leader)
+FOLLOW_TIMEOUT_SECONDS  = 60.0   # give up on a leader that stops sending frames
+
+_inflight: dict = {}   # cache key → _Broadcast
+
+
+class _Broadcast:
+    """Fan-out of one model stream's SSE frames to identical concurrent requests."""
+
+    def __init__(self):
+        self.frames: List[str] = []
+        self.queues: List[asyncio.Queue] = []
+        self.started = time.monotonic()
+        self.closed = False
+        self.task: Optional[asyncio.Task] = None
+
+    def joinable(self) -> bool:
+        return (len(self.queues) < COALESCE_MAX_FOLLOWERS
+                and time.monotonic() - self.started < COALESCE_WINDOW_SECONDS)
+
+    def publish(self, frame: Optional[str]) -> None:
+        """Send a frame to every follower; None marks the end of the stream."""
+        if frame is None:
+            self.closed = True
+        else:
+            self.frames.append(frame)
+        for q in self.queues:
+            q.put_nowait(frame)
+
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue()
+        for frame in self.frames:
+            q.put_nowait(frame)
+        if self.closed:
+            q.put_nowait(None)
+        self.queues.append(q)
+        return q
+
+
+def _release(key: str, group: _Broadcast, error_frame: Optional[str] = None) -> None:
+    if _inflight.get(key) is group:
+        del _inflight[key]
+    if error_frame:
+        group.publish(error_frame)
+        group.publish(_sse({"done": True}))
+    group.publish(None)
+
+
+async def _follow(q: asyncio.Queue):
+    while True:
+        try:
+            frame = await asyncio.wait_for(q.get(), timeout=FOLLOW_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            yield _INTERRUPTED_FRAME
+            yield _sse({"done": True})
+            return
+        if frame is None:
+            return
+        yield frame
+
+
+async def _produce(key: str, group: _Broadcast, stream_gen) -> None:
+    """Drain the model stream into the group; ends every subscriber's stream cleanly."""
+    finished = False
+    try:
+        async for frame in stream_gen:
+            group.publish(frame)
+        finished = True
+    finally:
+        await stream_gen.aclose()
+        # Cancelled / crashed mid-reply: tell subscribers instead of just stopping
+        _release(key, group, None if finished else _INTERRUPTED_FRAME)
+
+
+def _start(key: str, group: _Broadcast, stream_gen) -> asyncio.Queue:
+    """Run stream_gen in its own task and return the starter's subscription."""
+    q = group.subscribe()
+    group.task = asyncio.create_task(_produce(key, group, stream_gen))
+    return q
+
+
 # ── POST /ai/chat (streaming) ────────────────────────────────────────────────
 
 @router.post("/chat")
-def ai_chat(body: ChatRequest):
+async def ai_chat(body: ChatRequest):
     if not client:
         raise HTTPException(
             status_code=503,
             detail="AI service not configured. Set GROQ_API_KEY in your .env file."
         )
 
+    sse_headers = {
+        "Cache-Control":     "no-cache",
+        "Connection":        "keep-alive",
+        "X-Accel-Buffering": "no",
+    }
+
+    if _is_off_topic(body.messages):
+        return StreamingResponse(_replay(OFF_TOPIC_REPLY), media_type="text/event-stream", headers=sse_headers)
+
+    key = _cache_key(body.messages, bool(body.is_urgent))
+    cached = _cache_get(key)
+    if cached is not None:
+        return StreamingResponse(_replay(cached), media_type="text/event-stream", headers=sse_headers)
+
+    group = _inflight.get(key)
+    if group is not None and group.joinable():
+        return StreamingResponse(_follow(group.subscribe()), media_type="text/event-stream", headers=sse_headers)
+
+    # Lead a new group unless a live one is merely full
+    leader = None
+    if group is None or time.monotonic() - group.started >= COALESCE_WINDOW_SECONDS:
+        leader = _inflight[key] = _Broadcast()
+
     messages_payload = _build_messages(body.messages)
-    models_to_try = [MODEL] + FALLBACK_MODELS
+    models_to_try = _models_for(messages_payload)
+    params = URGENT_GENERATION_PARAMS if body.is_urgent else GENERATION_PARAMS
 
-    stream_gen, error = _try_stream(messages_payload, models_to_try)
+    stream_gen, error = None, None
+    try:
+        stream_gen, error = await _try_stream(messages_payload, models_to_try, params, cache_key=key)
+    finally:
+        if leader is not None and not stream_gen:
+            _release(key, leader, _sse({"token": "⚠️ AI service is busy. Please try again."}))
 
     if error:
-        if "429" in error or "rate_limit" in error.lower():
+        if isinstance(error, RateLimitError):
             raise HTTPException(
                 status_code=429,
                 detail="AI rate limit reached. Please wait a moment and try again."
@@ -259,17 +637,15 @@ def ai_chat(body: ChatRequest):
     if not stream_gen:
         raise HTTPException(status_code=502, detail="No response from AI service.")
 
-    return StreamingResponse(
-        stream_gen,
-        media_type="text/plain",
-        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
-    )
+    # An unregistered group when the live one is full: same task lifecycle, no joiners
+    q = _start(key, leader or _Broadcast(), stream_gen)
+    return StreamingResponse(_follow(q), media_type="text/event-stream", headers=sse_headers)
 
 
 # ── POST /ai/chat/sync (non-streaming fallback) ──────────────────────────────
 
 @router.post("/chat/sync")
-def ai_chat_sync(body: ChatRequest):
+async def ai_chat_sync(body: ChatRequest):
     """Non-streaming version for simpler clients."""
     if not client:
         raise HTTPException(
@@ -277,27 +653,40 @@ def ai_chat_sync(body: ChatRequest):
             detail="AI service not configured. Set GROQ_API_KEY in your .env file."
         )
 
+    if _is_off_topic(body.messages):
+        return {"reply": OFF_TOPIC_REPLY}
+
+    key = _cache_key(body.messages, bool(body.is_urgent))
+    cached = _cache_get(key)
+    if cached is not None:
+        return {"reply": cached}
+
     messages_payload = _build_messages(body.messages)
-    models_to_try = [MODEL] + FALLBACK_MODELS
+    models_to_try = _models_for(messages_payload)
+    params = URGENT_GENERATION_PARAMS if body.is_urgent else GENERATION_PARAMS
     last_error = None
 
     for model_name in models_to_try:
         try:
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=model_name,
                 messages=messages_payload,
-                temperature=0.7,
-                max_tokens=2048,
                 stream=False,
+                **params,
             )
-            return {"reply": response.choices[0].message.content}
+            reply = response.choices[0].message.content
+            _cache_put(key, reply)
+            return {"reply": reply}
+        except RateLimitError as e:
+            logger.warning(f"Sync model {model_name} rate-limited: {e}")
+            last_error = e
+            if model_name == MODEL:
+                _primary_budget.exhaust()
         except Exception as e:
-            last_error = str(e)
-            logger.warning(f"Sync model {model_name} failed: {last_error}")
-            if "429" in last_error or "rate_limit" in last_error.lower():
-                continue
+            logger.warning(f"Sync model {model_name} failed: {e}")
+            last_error = e
             break
 
-    if "429" in (last_error or "") or "rate_limit" in (last_error or "").lower():
+    if isinstance(last_error, RateLimitError):
         raise HTTPException(status_code=429, detail="AI rate limit reached. Please wait and try again.")
     raise HTTPException(status_code=502, detail=f"AI service error: {last_error}")
@@ -9,18 +9,25 @@ Endpoints consumed by:
                     → POST /auth/otp/verify
 """
 
-import random
-import string
-from datetime import datetime, timedelta, timezone
+import asyncio
+import secrets
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 
 from utils.db import supabase
 from utils.sms import send_sms
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Table builders bound once. Each .select()/.insert() starts a fresh query, so
+# sharing them is safe, and they keep the service-role session they were
+# created with even after sign_up / sign_in swap the shared client's auth.
+_donors    = supabase.table("donors")
+_hospitals = supabase.table("hospitals")
+_profiles  = supabase.table("user_with_profile")
 
 
 # ── Pydantic Models ───────────────────────────────────────────────────────────
@@ -77,7 +84,7 @@ class OtpVerifyRequest(BaseModel):
 # ── Donor Registration ────────────────────────────────────────────────────────
 
 @router.post("/register/donor")
-def register_donor(req: DonorRegisterRequest):
+async def register_donor(req: DonorRegisterRequest):
     """
     Called by Register.tsx (DonorRegister component) on step 3 submit.
     1. Creates Supabase Auth user
@@ -85,7 +92,7 @@ def register_donor(req: DonorRegisterRequest):
     """
     # 1. Create auth user
     try:
-        auth_res = supabase.auth.sign_up({
+        auth_res = await asyncio.to_thread(supabase.auth.sign_up, {
             "email": req.email,
             "password": req.password,
         })
@@ -98,7 +105,7 @@ def register_donor(req: DonorRegisterRequest):
 
     # 2. Insert donor profile
     try:
-        res = supabase.table("donors").insert({
+        res = await asyncio.to_thread(_donors.insert({
             "id":                 user_id,
             "name":               f"{req.first_name} {req.last_name}",
             "mobile":             req.mobile,
@@ -116,11 +123,11 @@ def register_donor(req: DonorRegisterRequest):
             "is_verified":        False,
             "lat":                req.lat,
             "lng":                req.lng,
-        }).execute()
+        }).execute)
     except Exception as e:
         # Cleanup auth user if profile fails
         try:
-            supabase.auth.admin.delete_user(user_id)
+            await asyncio.to_thread(supabase.auth.admin.delete_user, user_id)
         except Exception as delete_err:
             print(f"[register_donor] Cleanup failed: {delete_err}")
         err_msg = str(e)
@@ -144,11 +151,11 @@ def register_donor(req: DonorRegisterRequest):
 # ── Hospital Registration ─────────────────────────────────────────────────────
 
 @router.post("/register/hospital")
-def register_hospital(req: HospitalRegisterRequest):
+async def register_hospital(req: HospitalRegisterRequest):
     """Called by Register.tsx (HospitalRegister component) on submit."""
     print(f"[register_hospital] Attempting to sign up {req.contact_email}")
     try:
-        auth_res = supabase.auth.sign_up({
+        auth_res = await asyncio.to_thread(supabase.auth.sign_up, {
             "email": req.contact_email,
             "password": req.password,
         })
@@ -167,7 +174,7 @@ def register_hospital(req: HospitalRegisterRequest):
         )
 
     try:
-        res = supabase.table("hospitals").insert({
+        res = await asyncio.to_thread(_hospitals.insert({
             "id":          user_id,
             "name":        req.name,
             "reg_number":  req.reg_number,
@@ -178,13 +185,13 @@ def register_hospital(req: HospitalRegisterRequest):
             "is_verified": False,
             "lat":         req.lat,
             "lng":         req.lng,
-        }).execute()
+        }).execute)
     except Exception as e:
         # Cleanup auth user if profile fails
         print(f"[register_hospital] Profile insert failed: {e}")
         if user_id:
             try:
-                supabase.auth.admin.delete_user(user_id)
+                await asyncio.to_thread(supabase.auth.admin.delete_user, user_id)
                 print(f"[register_hospital] Cleaned up user {user_id}")
             except Exception as delete_err:
                 print(f"[register_hospital] Cleanup failed: {delete_err}")
@@ -208,41 +215,43 @@ def register_hospital(req: HospitalRegisterRequest):
 # ── Login ─────────────────────────────────────────────────────────────────────
 
 @router.post("/login")
-def login(req: LoginRequest):
+async def login(req: LoginRequest):
     """
     Called by Login.tsx on 'Sign In' button.
     Returns a session token the frontend stores in localStorage.
+    The profile is looked up by email concurrently with sign-in, so login
+    costs one round-trip instead of two.
     """
-    try:
-        res = supabase.auth.sign_in_with_password({
-            "email": req.email,
-            "password": req.password,
-        })
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Login failed: {e}")
+    sign_in = asyncio.to_thread(supabase.auth.sign_in_with_password, {
+        "email": req.email,
+        "password": req.password,
+    })
+    lookup = asyncio.to_thread(
+        _profiles.select("id, donor, hospital").eq("email", req.email.lower()).limit(1).execute
+    )
+    res, profile_res = await asyncio.gather(sign_in, lookup, return_exceptions=True)
+
+    if isinstance(res, Exception):
+        raise HTTPException(status_code=401, detail=f"Login failed: {res}")
 
     if not res.session:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     user_id = res.user.id
 
-    # Look up additional profile details
+    # Pick the profile for the requested role
     profile = None
     redirect = "/dashboard"
+    if req.role == "hospital":
+        redirect = "/dashboard?role=hospital"
 
-    try:
-        if req.role == "donor":
-            p = supabase.table("donors").select("name,city,blood_group,trust_score,is_verified,donor_types").eq("id", user_id).single().execute()
-            profile = p.data
-            redirect = "/dashboard"
-        elif req.role == "hospital":
-            p = supabase.table("hospitals").select("name,city,is_verified").eq("id", user_id).single().execute()
-            profile = p.data
-            redirect = "/dashboard?role=hospital"
-    except Exception as e:
+    if isinstance(profile_res, Exception):
         # Profile not found in DB — login still succeeds, but profile will be None
-        print(f"[login] Profile lookup failed for {req.role} {user_id}: {e}")
-        profile = None
+        print(f"[login] Profile lookup failed for {req.role} {user_id}: {profile_res}")
+    else:
+        row = (profile_res.data or [None])[0]
+        if row and row["id"] == user_id and req.role in ("donor", "hospital"):
+            profile = row.get(req.role)
 
     return {
         "success": True,
@@ -262,13 +271,10 @@ def send_otp(req: OtpSendRequest):
     Called by Login.tsx and Register.tsx 'Get OTP' button.
     Generates 6-digit OTP, stores it, sends via Twilio SMS.
     """
-    otp = "".join(random.choices(string.digits, k=6))
+    otp = f"{secrets.randbelow(1_000_000):06d}"
 
-    # Upsert into otp_store (mobile is primary key)
-    supabase.table("otp_store").upsert({
-        "mobile": req.mobile,
-        "otp": otp,
-    }).execute()
+    # Upsert into otp_store (mobile is primary key); created_at is reset by the DB
+    supabase.rpc("store_otp", {"p_mobile": req.mobile, "p_otp": otp}).execute()
 
     sms_sent = send_sms(
         req.mobile,
@@ -289,25 +295,13 @@ def send_otp(req: OtpSendRequest):
 @router.post("/otp/verify")
 def verify_otp(req: OtpVerifyRequest):
     """Called after user enters the 6-digit OTP."""
-    res = supabase.table("otp_store") \
-        .select("otp, created_at") \
-        .eq("mobile", req.mobile) \
-        .single() \
-        .execute()
-
-    if not res.data:
-        raise HTTPException(status_code=400, detail="No OTP found for this mobile number")
-
-    stored = res.data
-    # Check expiry (10 minutes)
-    created = datetime.fromisoformat(stored["created_at"].replace("Z", "+00:00"))
-    if datetime.now(timezone.utc) - created > timedelta(minutes=10):
-        raise HTTPException(status_code=400, detail="OTP expired. Please request a new one.")
-
-    if stored["otp"] != req.otp:
-        raise HTTPException(status_code=400, detail="Incorrect OTP")
+    # Match, 10-minute expiry and delete happen atomically in the database
+    res = supabase.rpc("verify_and_consume_otp", {
+        "p_mobile": req.mobile,
+        "p_otp":    req.otp,
+    }).execute()
 
-    # Delete after successful verification
-    supabase.table("otp_store").delete().eq("mobile", req.mobile).execute()
+    if res.data is not True:
+        raise HTTPException(status_code=400, detail="Incorrect or expired OTP. Please request a new one.")
 
     return {"success": True, "verified": True, "mobile": req.mobile}
\ No newline at end of file
@@ -10,22 +10,41 @@ Endpoints consumed by BloodBridge.tsx:
   GET  /blood/shortage            → shortage prediction widget
 """
 
-from datetime import date, datetime, timezone
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
 from typing import Optional
+import asyncio
+import heapq
+import math
 import time
 import logging
 
-from fastapi import APIRouter, Query, HTTPException
+import numpy as np
+from fastapi import APIRouter, BackgroundTasks, Query, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
 from utils.db import supabase
-from utils.matching import blood_compatible, haversine, days_since
-from utils.sms import alert_donors
+from utils.matching import CAN_DONATE_TO, compatible_donor_groups, haversine_many, days_since_many
+from utils.sms import alert_donors, sms_configured
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 logger = logging.getLogger(__name__)
 
 
+# ── SMS templates ─────────────────────────────────────────────────────────────
+
+_SMS_BROADCAST_TMPL = (
+    "🩸 URGENT: {group} blood needed ({units} unit/s) at {hospital}, {city}. "
+    "Reply YES or visit lifeforge.in. LifeForge Connect."
+)
+_SMS_DIRECT_TMPL = (
+    "🩸 {hospital}, {city} needs {group} blood ({units} unit/s). "
+    "You were specifically requested! Reply YES or visit lifeforge.in. LifeForge Connect."
+)
+
+
 # ── Retry helper for Windows socket issues ────────────────────────────────────
 
 def _safe_execute(query, retries=3, delay=0.5):
@@ -48,24 +67,94 @@ def _safe_execute(query, retries=3, delay=0.5):
 
 # ── Notification helper ───────────────────────────────────────────────────────
 
-def _create_notification(user_id: str, title: str, message: str, notif_type: str):
-    """Insert a row into the notifications table. Never raises — non-critical."""
+def _build_notification(user_id: str, title: str, message: str, notif_type: str) -> dict:
+    """Row for the notifications table."""
+    return {
+        "user_id":  user_id,
+        "title":    title,
+        "message":  message,
+        "type":     notif_type,
+        "is_read":  False,
+    }
+
+
+def _notify_compatible_donors(groups: list[str], title: str, message: str):
+    """Notify every available donor in `groups` via one RPC. Never raises — non-critical."""
     try:
-        supabase.table("notifications").insert({
-            "user_id":  user_id,
-            "title":    title,
-            "message":  message,
-            "type":     notif_type,
-            "is_read":  False,
+        supabase.rpc("notify_compatible_donors", {
+            "p_groups":  groups,
+            "p_title":   title,
+            "p_message": message,
         }).execute()
     except Exception:
         pass
 
 
+def _insert_notifications(rows: list[dict]):
+    """Insert notification rows in one request. Never raises — non-critical."""
+    if not rows:
+        return
+    try:
+        supabase.table("notifications").insert(rows, returning="minimal").execute()
+    except Exception:
+        pass
+
+
+# ── Request row formatting ────────────────────────────────────────────────────
+
+# Hours a request stays actionable, by urgency
+_URGENCY_MAX_HOURS = {"CRITICAL": 6, "URGENT": 12, "NORMAL": 24}
+_DEFAULT_MAX_HOURS = 12
+
+# "Hh MMm" for every whole minute up to the longest urgency window
+_TIMELEFT_LABELS = [f"{m // 60}h {m % 60:02d}m" for m in range(max(_URGENCY_MAX_HOURS.values()) * 60 + 1)]
+
+
+def _timeleft_label(minutes: int) -> str:
+    if minutes < len(_TIMELEFT_LABELS):
+        return _TIMELEFT_LABELS[minutes]
+    return f"{minutes // 60}h {minutes % 60:02d}m"
+
+
+@lru_cache(maxsize=2048)
+def _posted_label(minutes: int) -> str:
+    return f"{minutes} min ago" if minutes < 60 else f"{minutes // 60}h ago"
+
+
+def _format_request_row(r: dict, now_ts: float) -> dict:
+    """Shape a blood_requests row (with embedded hospital) for the request cards."""
+    hospital      = r.get("hospitals") or {}
+    # fromisoformat accepts Postgres' "+00:00" and a trailing "Z" as-is (3.11+);
+    # epoch floats avoid building a timedelta per row
+    elapsed       = now_ts - datetime.fromisoformat(r["created_at"]).timestamp()
+    hours_elapsed = elapsed / 3600
+
+    urgency         = (r.get("urgency") or "normal").upper()
+    max_hours       = _URGENCY_MAX_HOURS.get(urgency, _DEFAULT_MAX_HOURS)
+    time_left_hours = max(0, max_hours - hours_elapsed)
+
+    return {
+        "id":         r["id"],
+        "hospital":   hospital.get("name", "Unknown Hospital"),
+        "group":      r.get("blood_group"),
+        "units":      r.get("units", 1),
+        "urgency":    urgency,
+        "timeLeft":   _timeleft_label(int(time_left_hours * 60)),
+        "hours_left": time_left_hours,
+        "city":       hospital.get("city", ""),
+        "posted":     _posted_label(int(elapsed / 60)),
+    }
+
+
 # ── GET /blood/donors ─────────────────────────────────────────────────────────
 
+_rank_key = itemgetter(0)   # results are (sort key, row) pairs
+
+DONATION_GAP_DAYS = 90      # min days between whole-blood donations
+
+
 @router.get("/donors")
-def get_blood_donors(
+async def get_blood_donors(
     blood_group: Optional[str] = Query(None),
     city:        Optional[str] = Query(None),
     pincode:     Optional[str] = Query(None),
@@ -73,45 +162,61 @@ def get_blood_donors(
     lng:         Optional[float] = Query(None),
     limit:       int = Query(20, le=50),
 ):
-    query = supabase.table("donors") \
-        .select("id, name, city, pincode, blood_group, trust_score, is_available, is_verified, lat, lng, last_donation_date, donor_types") \
-        .eq("is_available", True)
-
-    if pincode:
-        query = query.eq("pincode", pincode)
-
-    res = query.limit(200).execute()
-    donors = res.data or []
+    def donor_query():
+        query = supabase.table("donors") \
+            .select("id, name, city, pincode, blood_group, trust_score, is_available, is_verified, lat, lng, last_donation_date, donor_types") \
+            .eq("is_available", True) \
+            .or_("donor_types.cs.{blood},donor_types.eq.{},donor_types.is.null")
+
+        if pincode:
+            query = query.eq("pincode", pincode)
+        if city:
+            query = query.ilike("city", f"%{city}%")
+        if blood_group:
+            query = query.in_("blood_group", compatible_donor_groups(blood_group))
+
+        # trust_score is nullable and DESC sorts NULLs first; postgrest-py 0.16's
+        # nullsfirst=False emits nothing, so spell out PostgREST's nullslast
+        return query.order("trust_score.desc.nullslast").limit(limit)
+
+    # Ranking is eligible-first, then trust. Each eligibility bucket is sorted
+    # and cut to `limit` by Postgres, so at most 3 × limit rows come back and
+    # the top `limit` overall is guaranteed to be among them.
+    cutoff = (date.today() - timedelta(days=DONATION_GAP_DAYS)).isoformat()
+    never_donated, rested, recent = await asyncio.gather(
+        asyncio.to_thread(donor_query().is_("last_donation_date", "null").execute),
+        asyncio.to_thread(donor_query().lte("last_donation_date", cutoff).execute),
+        asyncio.to_thread(donor_query().gt("last_donation_date", cutoff).execute),
+    )
+    donors = (never_donated.data or []) + (rested.data or []) + (recent.data or [])
 
     results = []
 
-    for d in donors:
-        if city:
-            donor_city = (d.get("city") or "").lower()
-            if city.lower() not in donor_city:
-                continue
-
-        if blood_group and d.get("blood_group"):
-            if not blood_compatible(d["blood_group"], blood_group):
-                continue
+    # Days since last donation for every donor in one pass (NaN = no record)
+    since_days = days_since_many([d.get("last_donation_date") for d in donors])
 
-        dtypes = d.get("donor_types") or []
-        has_blood_type = "blood" in dtypes
-        if dtypes and not has_blood_type:
-            continue
+    # Distance to every donor in one vectorised pass (NaN = no coordinates)
+    distances = None
+    if lat is not None and lng is not None and donors:
+        distances = haversine_many(
+            lat, lng,
+            np.fromiter((np.nan if d.get("lat") is None else d["lat"] for d in donors), dtype=np.float64, count=len(donors)),
+            np.fromiter((np.nan if d.get("lng") is None else d["lng"] for d in donors), dtype=np.float64, count=len(donors)),
+        )
 
-        last = d.get("last_donation_date")
-        since = days_since(last)
-        eligible = since is None or since >= 90
+    for i, d in enumerate(donors):
+        since = None if math.isnan(since_days[i]) else int(since_days[i])
+        eligible = since is None or since >= DONATION_GAP_DAYS
 
-        trust_raw   = d.get("trust_score", 50)
+        trust_raw   = d.get("trust_score") or 0   # unscored ranks last
         trust_stars = round(trust_raw / 100 * 5, 1)
 
         distance_km = None
-        if lat and lng and d.get("lat") and d.get("lng"):
-            distance_km = haversine(lat, lng, d["lat"], d["lng"])
+        if distances is not None and not math.isnan(distances[i]):
+            distance_km = float(distances[i])
 
-        results.append({
+        # Rank key computed once per donor: eligible first, then most trusted
+        results.append(((eligible, trust_raw), {
             "id":                d["id"],
             "name":              d["name"],
             "city":              d["city"] or "",
@@ -124,10 +229,9 @@ def get_blood_donors(
             "last_donated":      f"{since} days ago" if since is not None else "No record",
             "distance_km":       distance_km,
             "distance":          f"{distance_km} km" if distance_km is not None else "—",
-        })
+        }))
 
-    results.sort(key=lambda x: (-int(x["eligible_to_donate"]), -x["trust_score"]))
-    return results[:limit]
+    return [row for _, row in heapq.nlargest(limit, results, key=_rank_key)]
 
 
 # ── GET /blood/requests/open ──────────────────────────────────────────────────
@@ -144,37 +248,8 @@ def get_open_blood_requests():
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Database error: {e}")
 
-    results = []
-    now = datetime.now(timezone.utc)
-
-    for r in (res.data or []):
-        hospital = r.get("hospitals") or {}
-        raw_ts   = r["created_at"].replace("Z", "+00:00")
-        created  = datetime.fromisoformat(raw_ts)
-        elapsed  = now - created
-        hours_elapsed = elapsed.total_seconds() / 3600
-
-        urgency   = (r.get("urgency") or "normal").upper()
-        max_hours = {"CRITICAL": 6, "URGENT": 12, "NORMAL": 24}.get(urgency, 12)
-        time_left_hours = max(0, max_hours - hours_elapsed)
-        h = int(time_left_hours)
-        m = int((time_left_hours - h) * 60)
-
-        results.append({
-            "id":         r["id"],
-            "hospital":   hospital.get("name", "Unknown Hospital"),
-            "group":      r["blood_group"],
-            "units":      r.get("units", 1),
-            "urgency":    urgency,
-            "timeLeft":   f"{h}h {m:02d}m",
-            "hours_left": time_left_hours,
-            "city":       hospital.get("city", ""),
-            "posted":     f"{int(elapsed.total_seconds() / 60)} min ago"
-                          if elapsed.total_seconds() < 3600
-                          else f"{int(hours_elapsed)}h ago",
-        })
-
-    return results
+    now_ts = time.time()
+    return [_format_request_row(r, now_ts) for r in (res.data or [])]
 
 
 # ── POST /blood/requests ──────────────────────────────────────────────────────
@@ -189,10 +264,14 @@ class BloodRequestBody(BaseModel):
 
 
 @router.post("/requests")
-def post_blood_request(body: BloodRequestBody):
+async def post_blood_request(body: BloodRequestBody, background: BackgroundTasks):
     """Hospital posts a general blood request — notifies all compatible donors."""
-    # 1. Create the request
-    res = supabase.table("blood_requests").insert({
+    # 1–3. Create the request, look up the hospital name for notifications +
+    #      SMS, and pick the SMS targets (top 5 most trusted compatible donors
+    #      with a mobile). None of these depend on each other, so they run
+    #      concurrently.
+    groups = compatible_donor_groups(body.blood_group)
+    insert_q = supabase.table("blood_requests").insert({
         "hospital_id": body.hospital_id,
         "blood_group": body.blood_group,
         "units":       body.units,
@@ -200,52 +279,58 @@ def post_blood_request(body: BloodRequestBody):
         "status":      "open",
         "lat":         body.lat,
         "lng":         body.lng,
-    }).execute()
+    })
+    hosp_q = supabase.table("hospitals") \
+        .select("name, city") \
+        .eq("id", body.hospital_id) \
+        .maybe_single()
+    sms_q = supabase.rpc("compatible_sms_targets", {
+        "p_recipient": body.blood_group,
+        "p_limit":     5,
+    })
+
+    # return_exceptions: once the insert has committed, a failed lookup must not
+    # turn into a 500 (the client would retry and post a duplicate request)
+    res, hosp, sms_res = await asyncio.gather(
+        asyncio.to_thread(insert_q.execute),
+        asyncio.to_thread(hosp_q.execute),
+        asyncio.to_thread(sms_q.execute),
+        return_exceptions=True,
+    )
 
+    if isinstance(res, Exception):
+        raise HTTPException(status_code=500, detail=f"Failed to create blood request: {str(res)}")
     if not res.data:
         raise HTTPException(status_code=500, detail="Failed to create blood request")
 
     request_id = res.data[0]["id"]
+    if isinstance(hosp, Exception) or not hosp or not hosp.data:
+        logger.warning(f"Hospital lookup failed for blood request {request_id}: {hosp}")
+        hosp_name, hosp_city = "A hospital", ""
+    else:
+        hosp_name = hosp.data["name"]
+        hosp_city = hosp.data.get("city", "")
+
+    # In-app notification for every compatible donor — fanned out in Postgres
+    await asyncio.to_thread(
+        _notify_compatible_donors,
+        groups,
+        f"🩸 Urgent: {body.blood_group} blood needed",
+        f"{hosp_name}, {hosp_city} needs {body.units} unit(s). Can you help?",
+    )
 
-    # 2. Get hospital name for notifications + SMS
-    hosp = supabase.table("hospitals") \
-        .select("name, city") \
-        .eq("id", body.hospital_id) \
-        .single() \
-        .execute()
-    hosp_name = hosp.data["name"] if hosp.data else "A hospital"
-    hosp_city = hosp.data.get("city", "") if hosp.data else ""
-
-    # 3. Find all compatible, available donors
-    donors_res = supabase.table("donors") \
-        .select("id, mobile, blood_group, name") \
-        .eq("is_available", True) \
-        .execute()
-
-    alerted_mobiles = []
-
-    for d in (donors_res.data or []):
-        if not blood_compatible(d.get("blood_group", ""), body.blood_group):
-            continue
-
-        # In-app notification for every compatible donor
-        _create_notification(
-            user_id    = d["id"],
-            title      = f"🩸 Urgent: {body.blood_group} blood needed",
-            message    = f"{hosp_name}, {hosp_city} needs {body.units} unit(s). Can you help?",
-            notif_type = "blood_request",
-        )
-
-        if d.get("mobile"):
-            alerted_mobiles.append(d["mobile"])
-
-    # 4. SMS top 5
-    sms_msg = (
-        f"🩸 URGENT: {body.blood_group} blood needed ({body.units} unit/s) at "
-        f"{hosp_name}, {hosp_city}. "
-        f"Reply YES or visit lifeforge.in. LifeForge Connect."
+    # 4. SMS top 5 — sent after the response goes out; the request is
+    #    already persisted, so the hospital doesn't wait on Twilio
+    sms_msg = _SMS_BROADCAST_TMPL.format(
+        group=body.blood_group, units=body.units, hospital=hosp_name, city=hosp_city,
     )
-    sms_count = alert_donors(alerted_mobiles[:5], sms_msg)
+    if isinstance(sms_res, Exception):
+        logger.warning(f"SMS target lookup failed for blood request {request_id}: {sms_res}")
+        sms_targets = []
+    else:
+        sms_targets = [d["mobile"] for d in (sms_res.data or [])]
+    background.add_task(alert_donors, sms_targets, sms_msg)
+    sms_count = len(sms_targets) if sms_configured() else 0
 
     return {
         "success":        True,
@@ -266,34 +351,48 @@ class DonorRequestBody(BaseModel):
 
 
 @router.post("/donors/request")
-def request_specific_donor(body: DonorRequestBody):
+async def request_specific_donor(body: DonorRequestBody, background: BackgroundTasks):
     """Hospital targets a specific donor — notifies that donor directly."""
-    # 1. Validate hospital
-    try:
-        hosp = supabase.table("hospitals") \
-            .select("id, name, city") \
-            .eq("id", body.hospital_id) \
-            .single() \
-            .execute()
-    except Exception:
-        hosp = None
+    # 1. Validate hospital, and fetch the donor's name + mobile for the SMS
+    #    in the same round-trip window
+    hosp_q = supabase.table("hospitals") \
+        .select("id, name, city") \
+        .eq("id", body.hospital_id) \
+        .maybe_single()
+    donor_q = supabase.table("donors") \
+        .select("name, mobile") \
+        .eq("id", body.donor_id) \
+        .maybe_single()
+
+    hosp, donor = await asyncio.gather(
+        asyncio.to_thread(hosp_q.execute),
+        asyncio.to_thread(donor_q.execute),
+        return_exceptions=True,
+    )
 
-    if not hosp or not hosp.data:
+    if isinstance(hosp, Exception) or not hosp or not hosp.data:
         raise HTTPException(status_code=400, detail=f"Hospital ID not found: {body.hospital_id}")
 
     hosp_name   = hosp.data["name"]
     hosp_city   = hosp.data.get("city", "")
     hospital_id = hosp.data["id"]
 
+    if isinstance(donor, Exception) or not donor or not donor.data:
+        donor_name   = "Donor"
+        donor_mobile = None
+    else:
+        donor_name   = donor.data["name"]
+        donor_mobile = donor.data.get("mobile")
+
     # 2. Create the blood request
     try:
-        res = supabase.table("blood_requests").insert({
+        res = await asyncio.to_thread(supabase.table("blood_requests").insert({
             "hospital_id": hospital_id,
             "blood_group": body.blood_group,
             "units":       body.units,
             "urgency":     body.urgency,
             "status":      "open",
-        }).execute()
+        }).execute)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create blood request: {str(e)}")
 
@@ -302,53 +401,42 @@ def request_specific_donor(body: DonorRequestBody):
 
     request_id = res.data[0]["id"]
 
-    # 3. Create match record linking this request to the specific donor
-    try:
-        supabase.table("matches").insert({
-            "request_id":  request_id,
-            "donor_id":    body.donor_id,
-            "status":      "pending",
-            "module":      "blood",
-        }).execute()
-    except Exception:
-        pass
-
-    # 4. In-app notification to the specific donor
-    _create_notification(
-        user_id    = body.donor_id,
-        title      = f"🩸 {hosp_name} requested you specifically!",
-        message    = f"They need {body.blood_group} blood ({body.units} unit(s)). Please respond on LifeForge.",
-        notif_type = "blood_request",
+    # 3–5. Match record linking this request to the specific donor, plus
+    #      in-app notifications to the donor and to the hospital that their
+    #      request was sent. Independent, non-critical writes — sent together.
+    match_q = supabase.table("matches").insert({
+        "request_id":  request_id,
+        "donor_id":    body.donor_id,
+        "status":      "pending",
+        "module":      "blood",
+    }, returning="minimal")
+    await asyncio.gather(
+        asyncio.to_thread(match_q.execute),
+        asyncio.to_thread(_insert_notifications, [
+            _build_notification(
+                user_id    = body.donor_id,
+                title      = f"🩸 {hosp_name} requested you specifically!",
+                message    = f"They need {body.blood_group} blood ({body.units} unit(s)). Please respond on LifeForge.",
+                notif_type = "blood_request",
+            ),
+            _build_notification(
+                user_id    = hospital_id,
+                title      = f"✅ Donor request sent",
+                message    = f"Your request for {body.blood_group} blood has been sent to the donor.",
+                notif_type = "blood_response",
+            ),
+        ]),
+        return_exceptions=True,
     )
 
-    # 5. Also notify the hospital that their request was sent
-    _create_notification(
-        user_id    = hospital_id,
-        title      = f"✅ Donor request sent",
-        message    = f"Your request for {body.blood_group} blood has been sent to the donor.",
-        notif_type = "blood_response",
-    )
-
-    # 6. SMS the donor
-    try:
-        donor = supabase.table("donors") \
-            .select("name, mobile") \
-            .eq("id", body.donor_id) \
-            .single() \
-            .execute()
-        donor_name   = donor.data["name"] if donor.data else "Donor"
-        donor_mobile = donor.data.get("mobile") if donor.data else None
-    except Exception:
-        donor_name   = "Donor"
-        donor_mobile = None
-
+    # 6. SMS the donor (in the background, after the response)
     sms_count = 0
     if donor_mobile:
-        sms_msg = (
-            f"🩸 {hosp_name}, {hosp_city} needs {body.blood_group} blood ({body.units} unit/s). "
-            f"You were specifically requested! Reply YES or visit lifeforge.in. LifeForge Connect."
+        sms_msg = _SMS_DIRECT_TMPL.format(
+            group=body.blood_group, units=body.units, hospital=hosp_name, city=hosp_city,
         )
-        sms_count = alert_donors([donor_mobile], sms_msg)
+        background.add_task(alert_donors, [donor_mobile], sms_msg)
+        sms_count = 1 if sms_configured() else 0
 
     return {
         "success":    True,
@@ -391,39 +479,15 @@ def get_requests_for_donor(
             .limit(30)
         )
 
-        now = datetime.now(timezone.utc)
+        now_ts = time.time()
+        can_give_to = CAN_DONATE_TO.get(donor_group, frozenset())
         results = []
 
         for r in (req_res.data or []):
             req_group = r.get("blood_group")
-            if req_group and not blood_compatible(donor_group, req_group):
+            if req_group and req_group not in can_give_to:
                 continue
-
-            hospital      = r.get("hospitals") or {}
-            raw_ts        = r["created_at"].replace("Z", "+00:00")
-            created       = datetime.fromisoformat(raw_ts)
-            elapsed       = now - created
-            hours_elapsed = elapsed.total_seconds() / 3600
-
-            urgency         = (r.get("urgency") or "normal").upper()
-            max_hours       = {"CRITICAL": 6, "URGENT": 12, "NORMAL": 24}.get(urgency, 12)
-            time_left_hours = max(0, max_hours - hours_elapsed)
-            h = int(time_left_hours)
-            m = int((time_left_hours - h) * 60)
-
-            results.append({
-                "id":         r["id"],
-                "hospital":   hospital.get("name", "Unknown Hospital"),
-                "group":      req_group,
-                "units":      r.get("units", 1),
-                "urgency":    urgency,
-                "timeLeft":   f"{h}h {m:02d}m",
-                "hours_left": time_left_hours,
-                "city":       hospital.get("city", ""),
-                "posted":     f"{int(elapsed.total_seconds() / 60)} min ago"
-                              if elapsed.total_seconds() < 3600
-                              else f"{int(hours_elapsed)}h ago",
-            })
+            results.append(_format_request_row(r, now_ts))
 
         return results
     
@@ -434,32 +498,27 @@ def get_requests_for_donor(
 
 # ── GET /blood/shortage ───────────────────────────────────────────────────────
 
-@router.get("/shortage")
-def get_blood_shortage():
-    req_res   = supabase.table("blood_requests").select("blood_group").eq("status", "open").execute()
-    donor_res = supabase.table("donors").select("blood_group").eq("is_available", True).execute()
-
-    req_count:   dict[str, int] = {}
-    donor_count: dict[str, int] = {}
+# Dashboard widget, not realtime — each worker recomputes at most every 30s
+SHORTAGE_TTL_SECONDS = 30.0
+_shortage_cache: Optional[tuple[float, list]] = None   # (monotonic time, result)
 
-    for r in (req_res.data or []):
-        g = r["blood_group"]
-        req_count[g] = req_count.get(g, 0) + 1
 
-    for d in (donor_res.data or []):
-        g = d.get("blood_group") or ""
-        if g:
-            donor_count[g] = donor_count.get(g, 0) + 1
+@router.get("/shortage")
+def get_blood_shortage():
+    global _shortage_cache
+    if _shortage_cache and time.monotonic() - _shortage_cache[0] < SHORTAGE_TTL_SECONDS:
+        return _shortage_cache[1]
 
-    all_groups = set(req_count) | set(donor_count)
-    shortages  = []
+    # Per-group counts come from the mv_blood_shortage materialized view (see schema.sql)
+    res = supabase.rpc("get_blood_shortage").execute()
 
-    for g in all_groups:
-        reqs   = req_count.get(g, 0)
-        donors = donor_count.get(g, 0)
+    shortages = []
+    for row in (res.data or []):
+        reqs    = row["requests"]
+        donors  = row["donors_available"]
         deficit = reqs - donors
         shortages.append({
-            "blood_group":      g,
+            "blood_group":      row["blood_group"],
             "requests":         reqs,
             "donors_available": donors,
             "deficit":          deficit,
@@ -467,4 +526,5 @@ def get_blood_shortage():
         })
 
     shortages.sort(key=lambda x: -x["deficit"])
-    return shortages
\ No newline at end of file
+    _shortage_cache = (time.monotonic(), shortages)
+    return shortages
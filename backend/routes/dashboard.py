@@ -9,6 +9,7 @@ Endpoints consumed by Dashboard.tsx (DonorDashboard, HospitalDashboard, AdminDas
   POST /dashboard/admin/verify    → approve/reject donor or hospital
 """
 
+import asyncio
 import logging
 import time
 
@@ -17,8 +18,9 @@ from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date
 
+from utils.cache import donor_profiles, hospital_profiles
 from utils.db import supabase
-from utils.matching import days_since, days_until, blood_compatible
+from utils.matching import days_since, days_until, CAN_DONATE_TO
 
 logger = logging.getLogger(__name__)
 
@@ -41,7 +43,7 @@ router = APIRouter()
 # ── GET /dashboard/donor/{id} ─────────────────────────────────────────────────
 
 @router.get("/donor/{donor_id}")
-def get_donor_dashboard(donor_id: str):
+async def get_donor_dashboard(donor_id: str):
     """
     Powers DonorDashboard component in Dashboard.tsx.
     Returns:
@@ -50,17 +52,51 @@ def get_donor_dashboard(donor_id: str):
       - urgent_requests nearby (blood + platelet)
       - donation_history table rows
     """
-    # Profile
-    donor = supabase.table("donors") \
+    # Profile, donation history, requests sent to this donor and the open
+    # blood / platelet feeds don't depend on each other — fetch concurrently.
+    # The profile is served from cache between polls when we have it.
+    d = donor_profiles.get(donor_id)
+    donor_q = supabase.table("donors") \
         .select("*") \
         .eq("id", donor_id) \
-        .single() \
-        .execute()
+        .single() if d is None else None
 
-    if not donor.data:
-        raise HTTPException(status_code=404, detail="Donor not found")
+    # Donation history from matches (matches has no FK to blood_requests, so fetch separately)
+    history_q = supabase.table("matches") \
+        .select("module, request_id, created_at") \
+        .eq("donor_id", donor_id) \
+        .eq("status", "fulfilled") \
+        .order("created_at", desc=True) \
+        .limit(10)
 
-    d = donor.data
+    # Requests sent directly TO this donor (matches with status=pending)
+    direct_q = supabase.table("matches") \
+        .select("module, request_id") \
+        .eq("donor_id", donor_id) \
+        .eq("status", "pending")
+
+    # Newest open blood (global top 20) and platelet (top 10) requests in one
+    # query — v_urgent_requests ranks each module's rows newest-first
+    open_q = supabase.table("v_urgent_requests") \
+        .select("id, module, blood_group, urgency, hospital_id, created_at") \
+        .lte("module_rank", 20) \
+        .order("created_at", desc=True)
+
+    donor, history_res, direct_matches, open_res = await asyncio.gather(
+        _execute_optional(donor_q),
+        asyncio.to_thread(history_q.execute),
+        asyncio.to_thread(direct_q.execute),
+        asyncio.to_thread(open_q.execute),
+    )
+    open_rows         = open_res.data or []
+    global_blood_reqs = [r for r in open_rows if r["module"] == "blood"]
+    platelet_urgent   = [r for r in open_rows if r["module"] == "platelet"][:10]
+
+    if d is None:
+        if not donor.data:
+            raise HTTPException(status_code=404, detail="Donor not found")
+        d = donor.data
+        donor_profiles.put(donor_id, d)
     since = days_since(d.get("last_donation_date"))
     next_eligible_days = max(0, 90 - since) if since is not None else 0
 
@@ -74,126 +110,62 @@ def get_donor_dashboard(donor_id: str):
     trust_raw   = d.get("trust_score", 50)
     trust_stars = round(trust_raw / 100 * 5, 1)
 
-    # Donation history from matches (matches has no FK to blood_requests, so fetch separately)
-    history_res = supabase.table("matches") \
-        .select("module, request_id, created_at") \
-        .eq("donor_id", donor_id) \
-        .eq("status", "fulfilled") \
-        .order("created_at", desc=True) \
-        .limit(10) \
-        .execute()
-
-    history = []
-    blood_ids = [m["request_id"] for m in (history_res.data or []) if m.get("module") == "blood" and m.get("request_id")]
-    platelet_ids = [m["request_id"] for m in (history_res.data or []) if m.get("module") == "platelet" and m.get("request_id")]
-
-    blood_map = {}
-    if blood_ids:
-        blood_req = supabase.table("blood_requests").select("id, blood_group, hospital_id").in_("id", blood_ids).execute()
-        for r in (blood_req.data or []):
-            blood_map[r["id"]] = dict(r, hospital_name="Unknown")
-        hosp_ids = [r["hospital_id"] for r in (blood_req.data or []) if r.get("hospital_id")]
-        if hosp_ids:
-            hosp_res = supabase.table("hospitals").select("id, name").in_("id", hosp_ids).execute()
-            hosp_map = {h["id"]: h["name"] for h in (hosp_res.data or [])}
-            for rid, r in blood_map.items():
-                r["hospital_name"] = hosp_map.get(r.get("hospital_id"), "Unknown")
-
-    platelet_map = {}
-    if platelet_ids:
-        plat_req = supabase.table("platelet_requests").select("id, blood_group, hospital_id").in_("id", platelet_ids).execute()
-        for r in (plat_req.data or []):
-            platelet_map[r["id"]] = dict(r, hospital_name="Unknown")
-        hosp_ids = [r["hospital_id"] for r in (plat_req.data or []) if r.get("hospital_id")]
-        if hosp_ids:
-            hosp_res = supabase.table("hospitals").select("id, name").in_("id", hosp_ids).execute()
-            hosp_map = {h["id"]: h["name"] for h in (hosp_res.data or [])}
-            for rid, r in platelet_map.items():
-                r["hospital_name"] = hosp_map.get(r.get("hospital_id"), "Unknown")
-
-    for m in (history_res.data or []):
-        module = m.get("module", "blood")
-        created = m.get("created_at", "")[:10]
-        req_id = m.get("request_id")
-        if module == "blood" and req_id and req_id in blood_map:
-            r = blood_map[req_id]
-            history.append({
-                "date":     _fmt_date(created),
-                "type":     f"🩸 Blood ({r.get('blood_group','')})",
-                "hospital": r.get("hospital_name", "Unknown"),
-                "status":   "Fulfilled",
-                "impact":   "2 lives saved",
-            })
-        elif module == "platelet" and req_id and req_id in platelet_map:
-            r = platelet_map[req_id]
-            history.append({
-                "date":     _fmt_date(created),
-                "type":     "⏱️ Platelets",
-                "hospital": r.get("hospital_name", "Unknown"),
-                "status":   "Fulfilled",
-                "impact":   "1 patient helped",
-            })
-
-    total_donations = len(history)
-    lives_impacted  = sum(2 if "Blood" in h["type"] else 1 for h in history)
-
-    # Requests sent directly TO this donor (matches with status=pending)
-    direct_matches = supabase.table("matches") \
-        .select("module, request_id") \
-        .eq("donor_id", donor_id) \
-        .eq("status", "pending") \
-        .execute()
-    direct_blood_ids = [m["request_id"] for m in (direct_matches.data or []) if m.get("module") == "blood" and m.get("request_id")]
-    direct_platelet_ids = [m["request_id"] for m in (direct_matches.data or []) if m.get("module") == "platelet" and m.get("request_id")]
-
-    # Explicitly fetch direct blood requests to ensure they appear even if not in top 20
-    direct_blood_reqs = []
-    if direct_blood_ids:
-        direct_res = supabase.table("blood_requests") \
-            .select("id, blood_group, urgency, hospital_id, created_at") \
-            .in_("id", direct_blood_ids) \
-            .eq("status", "open") \
-            .execute()
-        direct_blood_reqs = direct_res.data or []
-
-    # All open blood requests (global top 20)
-    global_blood_reqs = supabase.table("blood_requests") \
+    history_ids  = _request_ids_by_module(history_res.data or [])
+    blood_ids    = history_ids["blood"]
+    platelet_ids = history_ids["platelet"]
+
+    direct_ids          = _request_ids_by_module(direct_matches.data or [])
+    direct_blood_ids    = direct_ids["blood"]
+    direct_platelet_ids = direct_ids["platelet"]
+    direct_blood_set    = set(direct_blood_ids)
+    direct_platelet_set = set(direct_platelet_ids)
+
+    # Second wave, keyed on the ids above: the history rows' requests, and the
+    # direct blood requests so they appear even if not in the global top 20
+    blood_req_q = supabase.table("blood_requests") \
+        .select("id, blood_group, hospital_id") \
+        .in_("id", blood_ids) if blood_ids else None
+    plat_req_q = supabase.table("platelet_requests") \
+        .select("id, blood_group, hospital_id") \
+        .in_("id", platelet_ids) if platelet_ids else None
+    direct_blood_q = supabase.table("blood_requests") \
         .select("id, blood_group, urgency, hospital_id, created_at") \
-        .eq("status", "open") \
-        .order("created_at", desc=True) \
-        .limit(20) \
-        .execute()
-    
+        .in_("id", direct_blood_ids) \
+        .eq("status", "open") if direct_blood_ids else None
+
+    blood_req, plat_req, direct_res = await asyncio.gather(
+        _execute_optional(blood_req_q),
+        _execute_optional(plat_req_q),
+        _execute_optional(direct_blood_q),
+    )
+    blood_map         = {r["id"]: r for r in (blood_req.data or [])} if blood_req else {}
+    platelet_map      = {r["id"]: r for r in (plat_req.data or [])} if plat_req else {}
+    direct_blood_reqs = (direct_res.data or []) if direct_res else []
+
     # Merge direct and global requests
-    blood_map_merge = {r["id"]: r for r in (global_blood_reqs.data or [])}
+    blood_map_merge = {r["id"]: r for r in global_blood_reqs}
     for r in direct_blood_reqs:
         blood_map_merge[r["id"]] = r
     
     blood_requests_all = list(blood_map_merge.values())
 
-    platelet_urgent = supabase.table("platelet_requests") \
-        .select("id, blood_group, hospital_id, created_at") \
-        .eq("status", "open") \
-        .order("created_at", desc=True) \
-        .limit(10) \
-        .execute()
-
     donor_blood = (d.get("blood_group") or "").strip()
+    can_give_to = CAN_DONATE_TO.get(donor_blood, frozenset())
 
     # Filter by donor compatibility; always include direct requests (sent to this donor)
     blood_filtered = []
     for r in blood_requests_all:
         req_group = r.get("blood_group") or ""
-        is_direct = r.get("id") in direct_blood_ids
-        compatible = not donor_blood or blood_compatible(donor_blood, req_group)
+        is_direct = r.get("id") in direct_blood_set
+        compatible = not donor_blood or req_group in can_give_to
         if is_direct or compatible:
             blood_filtered.append((r, is_direct))
 
     platelet_filtered = []
-    for r in (platelet_urgent.data or []):
+    for r in platelet_urgent:
         req_group = r.get("blood_group") or ""
-        is_direct = r.get("id") in direct_platelet_ids
-        compatible = not donor_blood or not req_group or blood_compatible(donor_blood, req_group)
+        is_direct = r.get("id") in direct_platelet_set
+        compatible = not donor_blood or not req_group or req_group in can_give_to
         if is_direct or compatible:
             platelet_filtered.append((r, is_direct))
 
@@ -201,19 +173,51 @@ def get_donor_dashboard(donor_id: str):
     blood_filtered.sort(key=lambda x: (not x[1], x[0].get("created_at") or ""), reverse=True)
     platelet_filtered.sort(key=lambda x: (not x[1], x[0].get("created_at") or ""), reverse=True)
 
-    hosp_ids = set()
-    for r, _ in blood_filtered[:5]:
-        if r.get("hospital_id"):
-            hosp_ids.add(r["hospital_id"])
-    for r, _ in platelet_filtered[:3]:
-        if r.get("hospital_id"):
-            hosp_ids.add(r["hospital_id"])
-
+    # One hospital lookup shared by the history rows and the urgent cards
+    hosp_ids = {
+        r["hospital_id"]
+        for r in (
+            *blood_map.values(),
+            *platelet_map.values(),
+            *(r for r, _ in blood_filtered[:5]),
+            *(r for r, _ in platelet_filtered[:3]),
+        )
+        if r.get("hospital_id")
+    }
     hosp_map = {}
     if hosp_ids:
-        hosp_res = supabase.table("hospitals").select("id, name, city").in_("id", list(hosp_ids)).execute()
+        hosp_res = await asyncio.to_thread(
+            supabase.table("hospitals").select("id, name, city").in_("id", list(hosp_ids)).execute
+        )
         hosp_map = {h["id"]: h for h in (hosp_res.data or [])}
 
+    history = []
+    for m in (history_res.data or []):
+        module = m.get("module", "blood")
+        created = m.get("created_at", "")[:10]
+        req_id = m.get("request_id")
+        if module == "blood" and req_id and req_id in blood_map:
+            r = blood_map[req_id]
+            history.append({
+                "date":     _fmt_date(created),
+                "type":     f"🩸 Blood ({r.get('blood_group','')})",
+                "hospital": hosp_map.get(r.get("hospital_id"), {}).get("name", "Unknown"),
+                "status":   "Fulfilled",
+                "impact":   "2 lives saved",
+            })
+        elif module == "platelet" and req_id and req_id in platelet_map:
+            r = platelet_map[req_id]
+            history.append({
+                "date":     _fmt_date(created),
+                "type":     "⏱️ Platelets",
+                "hospital": hosp_map.get(r.get("hospital_id"), {}).get("name", "Unknown"),
+                "status":   "Fulfilled",
+                "impact":   "1 patient helped",
+            })
+
+    total_donations = len(history)
+    lives_impacted  = sum(2 if "Blood" in h["type"] else 1 for h in history)
+
     urgent = []
     for r, is_direct in blood_filtered[:5]:
         h = hosp_map.get(r.get("hospital_id"), {})
@@ -271,34 +275,44 @@ def get_donor_dashboard(donor_id: str):
 # ── GET /dashboard/hospital/{id} ──────────────────────────────────────────────
 
 @router.get("/hospital/{hospital_id}")
-def get_hospital_dashboard(hospital_id: str):
+async def get_hospital_dashboard(hospital_id: str):
     """Powers HospitalDashboard component in Dashboard.tsx."""
-    hosp = supabase.table("hospitals") \
+    h = hospital_profiles.get(hospital_id)
+    hosp_q = supabase.table("hospitals") \
         .select("*") \
         .eq("id", hospital_id) \
-        .single() \
-        .execute()
-
-    if not hosp.data:
-        raise HTTPException(status_code=404, detail="Hospital not found")
-
-    h = hosp.data
+        .single() if h is None else None
 
     # Active blood requests
-    blood_reqs = supabase.table("blood_requests") \
+    blood_q = supabase.table("blood_requests") \
         .select("*") \
         .eq("hospital_id", hospital_id) \
         .eq("status", "open") \
-        .order("created_at", desc=True) \
-        .execute()
+        .order("created_at", desc=True)
 
     # Active platelet requests
-    plat_reqs = supabase.table("platelet_requests") \
+    plat_q = supabase.table("platelet_requests") \
         .select("*") \
         .eq("hospital_id", hospital_id) \
         .eq("status", "open") \
-        .order("created_at", desc=True) \
-        .execute()
+        .order("created_at", desc=True)
+
+    # Fulfilled this month
+    fulfilled_q = supabase.table("matches").select("id", count="exact") \
+        .eq("status", "fulfilled")
+
+    hosp, blood_reqs, plat_reqs, fulfilled = await asyncio.gather(
+        _execute_optional(hosp_q),
+        asyncio.to_thread(blood_q.execute),
+        asyncio.to_thread(plat_q.execute),
+        asyncio.to_thread(fulfilled_q.execute),
+    )
+
+    if h is None:
+        if not hosp.data:
+            raise HTTPException(status_code=404, detail="Hospital not found")
+        h = hosp.data
+        hospital_profiles.put(hospital_id, h)
 
     # Build combined active_requests list matching HospitalDashboard.tsx
     # Batch-fetch all matches and donors to avoid N+1 queries / socket exhaustion
@@ -308,9 +322,10 @@ def get_hospital_dashboard(hospital_id: str):
     # Single query to get all pending matches for these requests
     all_matches_data = []
     if all_request_ids:
-        all_matches = _safe_execute(
+        all_matches = await asyncio.to_thread(
+            _safe_execute,
             supabase.table("matches")
-            .select("id, donor_id, status, request_id")
+            .select("request_id, donor_id")
             .in_("request_id", all_request_ids)
             .eq("status", "pending")
         )
@@ -319,17 +334,15 @@ def get_hospital_dashboard(hospital_id: str):
     # Group matches by request_id
     matches_by_request = {}
     for m in all_matches_data:
-        rid = m.get("request_id")
-        if rid not in matches_by_request:
-            matches_by_request[rid] = []
         if m.get("donor_id"):
-            matches_by_request[rid].append(m["donor_id"])
+            matches_by_request.setdefault(m["request_id"], []).append(m["donor_id"])
 
     # Single query to get all needed donors
     all_donor_ids = list({did for dids in matches_by_request.values() for did in dids})
     donors_by_id = {}
     if all_donor_ids:
-        d_res = _safe_execute(
+        d_res = await asyncio.to_thread(
+            _safe_execute,
             supabase.table("donors")
             .select("id, name, mobile, city")
             .in_("id", all_donor_ids)
@@ -365,10 +378,6 @@ def get_hospital_dashboard(hospital_id: str):
             "posted":   _time_ago(r.get("created_at", "")),
         })
 
-    # Fulfilled this month
-    fulfilled = supabase.table("matches").select("id", count="exact") \
-        .eq("status", "fulfilled").execute()
-
     return {
         "hospital": {
             "id":          hospital_id,
@@ -389,30 +398,40 @@ def get_hospital_dashboard(hospital_id: str):
 # ── GET /dashboard/admin ──────────────────────────────────────────────────────
 
 @router.get("/admin")
-def get_admin_dashboard():
+async def get_admin_dashboard():
     """Powers AdminDashboard component in Dashboard.tsx."""
-    unverified_donors = supabase.table("donors") \
+    unverified_donors_q = supabase.table("donors") \
         .select("id, name, city, created_at, donor_types") \
         .eq("is_verified", False) \
         .order("created_at", desc=True) \
-        .limit(20) \
-        .execute()
+        .limit(20)
 
-    unverified_hospitals = supabase.table("hospitals") \
+    unverified_hospitals_q = supabase.table("hospitals") \
         .select("id, name, city, reg_number, created_at") \
         .eq("is_verified", False) \
         .order("created_at", desc=True) \
-        .limit(20) \
-        .execute()
+        .limit(20)
 
-    flagged = supabase.table("donors") \
+    flagged_q = supabase.table("donors") \
         .select("id, name, city, trust_score") \
-        .lt("trust_score", 20) \
-        .execute()
-
-    total_donors    = supabase.table("donors").select("id", count="exact").execute()
-    total_hospitals = supabase.table("hospitals").select("id", count="exact").execute()
-    total_matches   = supabase.table("matches").select("id", count="exact").execute()
+        .lt("trust_score", 20)
+
+    # All six are independent — latency is the slowest call, not the sum
+    (
+        unverified_donors,
+        unverified_hospitals,
+        flagged,
+        total_donors,
+        total_hospitals,
+        total_matches,
+    ) = await asyncio.gather(
+        asyncio.to_thread(unverified_donors_q.execute),
+        asyncio.to_thread(unverified_hospitals_q.execute),
+        asyncio.to_thread(flagged_q.execute),
+        asyncio.to_thread(supabase.table("donors").select("id", count="exact").execute),
+        asyncio.to_thread(supabase.table("hospitals").select("id", count="exact").execute),
+        asyncio.to_thread(supabase.table("matches").select("id", count="exact").execute),
+    )
 
     pending = (len(unverified_donors.data or []) + len(unverified_hospitals.data or []))
 
@@ -467,10 +486,12 @@ def admin_verify(body: VerifyBody):
             "is_verified": body.approved,
             "trust_score": 60 if body.approved else 10,
         }).eq("id", body.entity_id).execute()
+        donor_profiles.pop(body.entity_id)
     elif body.entity_type == "hospital":
         supabase.table("hospitals").update({
             "is_verified": body.approved,
         }).eq("id", body.entity_id).execute()
+        hospital_profiles.pop(body.entity_id)
     else:
         raise HTTPException(status_code=400, detail="entity_type must be 'donor' or 'hospital'")
 
@@ -482,6 +503,23 @@ def admin_verify(body: VerifyBody):
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
+async def _execute_optional(query):
+    """Execute a query off the event loop; None (nothing to fetch) passes through."""
+    if query is None:
+        return None
+    return await asyncio.to_thread(query.execute)
+
+
+def _request_ids_by_module(rows: list[dict]) -> dict[str, list[str]]:
+    """Bucket match rows' request_ids by module in a single pass."""
+    buckets: dict[str, list[str]] = {"blood": [], "platelet": []}
+    for m in rows:
+        bucket = buckets.get(m.get("module"))
+        if bucket is not None and m.get("request_id"):
+            bucket.append(m["request_id"])
+    return buckets
+
+
 def _fmt_date(iso: str) -> str:
     try:
         from datetime import datetime
@@ -492,10 +530,8 @@ def _fmt_date(iso: str) -> str:
 
 def _time_ago(iso: str) -> str:
     try:
-        from datetime import datetime, timezone
-        dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
-        diff = datetime.now(timezone.utc) - dt
-        mins = int(diff.total_seconds() / 60)
+        from datetime import datetime
+        mins = int((time.time() - datetime.fromisoformat(iso).timestamp()) / 60)
         if mins < 60:
             return f"{mins} min ago"
         hours = mins // 60
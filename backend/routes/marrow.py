@@ -7,10 +7,12 @@ Endpoints consumed by MarrowMatch.tsx:
   GET  /marrow/donors         → donor list
 """
 
+import heapq
 from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from utils.cache import donor_profiles
 from utils.db import supabase
 from utils.matching import hla_score, hla_confidence
 
@@ -41,13 +43,16 @@ def find_marrow_matches(body: MarrowMatchRequest):
         .not_.is_("hla_type", "null") \
         .execute()
 
+    # Patient side is the same for every donor — build its set once
+    patient_hla = frozenset(body.patient_hla)
+
     matches = []
     for donor in (res.data or []):
         hla = donor.get("hla_type") or []
         if not hla:
             continue
 
-        score = hla_score(hla, body.patient_hla)
+        score = hla_score(hla, patient_hla)
         if score < body.min_match_percent:
             continue
 
@@ -71,8 +76,7 @@ def find_marrow_matches(body: MarrowMatchRequest):
             "status":      status,
         })
 
-    matches.sort(key=lambda x: -x["matchPct"])
-    top_10 = matches[:10]
+    top_10 = heapq.nlargest(10, matches, key=lambda x: x["matchPct"])
 
     return {
         "patient_hla": body.patient_hla,
@@ -112,6 +116,7 @@ def register_hla(body: RegisterHlaBody):
         "hla_type":    body.hla_type,
         "donor_types": existing_types,
     }).eq("id", body.donor_id).execute()
+    donor_profiles.pop(body.donor_id)
 
     return {
         "success": True,
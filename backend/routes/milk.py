@@ -15,6 +15,7 @@ from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from utils.cache import donor_profiles
 from utils.db import supabase
 
 router = APIRouter()
@@ -34,20 +35,22 @@ def get_milk_donors():
         .eq("is_available", True) \
         .execute()
 
+    milk_donors = res.data or []
+
+    # Fulfilled milk matches per listed donor, grouped in Postgres (one row per donor)
+    donor_ids = list({md["donor_id"] for md in milk_donors if md.get("donor_id")})
+    fed_counts: dict[str, int] = {}
+    if donor_ids:
+        impact_res = supabase.rpc("milk_fed_counts", {"p_donor_ids": donor_ids}).execute()
+        fed_counts = {row["donor_id"]: row["fed"] for row in (impact_res.data or [])}
+
     results = []
-    for md in (res.data or []):
+    for md in milk_donors:
         donor = md.get("donors") or {}
         age_m = md.get("baby_age_months")
         qty   = md.get("quantity_ml_per_day")
 
-        # Calculate impact from matches table
-        impact_res = supabase.table("matches") \
-            .select("id", count="exact") \
-            .eq("donor_id", md.get("donor_id")) \
-            .eq("module", "milk") \
-            .eq("status", "fulfilled") \
-            .execute()
-        babies_helped = impact_res.count or 0
+        babies_helped = fed_counts.get(md.get("donor_id"), 0)
         impact_label  = f"{babies_helped} {'babies' if babies_helped != 1 else 'baby'} fed" if babies_helped else "0 babies fed"
 
         results.append({
@@ -182,6 +185,7 @@ def register_milk_donor(body: MilkDonorBody):
         if body.pickup_location:
             update["city"] = body.pickup_location
         supabase.table("donors").update(update).eq("id", body.donor_id).execute()
+        donor_profiles.pop(body.donor_id)
 
     return {
         "success": True,
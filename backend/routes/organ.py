@@ -8,12 +8,17 @@ Endpoints consumed by LastGift.tsx:
   POST /organ/requests         → hospital posts a recipient in need
 """
 
+import heapq
+import math
 from typing import Optional
+
+import numpy as np
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 
+from utils.cache import donor_profiles
 from utils.db import supabase
-from utils.matching import blood_compatible, haversine
+from utils.matching import CAN_DONATE_TO, haversine_many
 
 router = APIRouter()
 
@@ -76,18 +81,32 @@ def get_organ_recipients(
     res = query.limit(50).execute()
     recipients = res.data or []
 
-    results = []
-    for r in recipients:
-        hospital = r.get("hospitals") or {}
-
-        # Blood compatibility filter
-        if blood_group and r.get("blood_group"):
-            if not blood_compatible(blood_group, r["blood_group"]):
-                continue
+    # Blood compatibility filter
+    can_give_to = CAN_DONATE_TO.get(blood_group, frozenset())
+    if blood_group:
+        recipients = [
+            r for r in recipients
+            if not r.get("blood_group") or r["blood_group"] in can_give_to
+        ]
+
+    # Rank by urgency score — only the top `limit` are returned, so partial-select
+    top = heapq.nlargest(limit, recipients, key=lambda r: r.get("urgency_score") or 5)
+    hospitals = [r.get("hospitals") or {} for r in top]
+
+    # Distances only for the rows being returned, in one vectorised pass
+    distances = None
+    if donor_lat is not None and donor_lng is not None and top:
+        distances = haversine_many(
+            donor_lat, donor_lng,
+            np.fromiter((np.nan if h.get("lat") is None else h["lat"] for h in hospitals), dtype=np.float64, count=len(top)),
+            np.fromiter((np.nan if h.get("lng") is None else h["lng"] for h in hospitals), dtype=np.float64, count=len(top)),
+        )
 
+    results = []
+    for i, (r, hospital) in enumerate(zip(top, hospitals)):
         dist = None
-        if donor_lat and donor_lng and hospital.get("lat") and hospital.get("lng"):
-            dist = haversine(donor_lat, donor_lng, hospital["lat"], hospital["lng"])
+        if distances is not None and not math.isnan(distances[i]):
+            dist = float(distances[i])
 
         results.append({
             "id":          r["id"],
@@ -99,14 +118,10 @@ def get_organ_recipients(
             "hospital_city": hospital.get("city", ""),
             "wait":        r.get("wait_label") or "—",
             "distance_km": dist,
+            "rank":        i + 1,
         })
 
-    # Rank by urgency score
-    results.sort(key=lambda x: -x["urgency"])
-    for i, r in enumerate(results):
-        r["rank"] = i + 1
-
-    return results[:limit]
+    return results
 
 
 # ── POST /organ/pledge ────────────────────────────────────────────────────────
@@ -143,6 +158,7 @@ def create_organ_pledge(body: OrganPledgeBody):
         types = donor.data.get("donor_types") or []
         if "organ" not in types:
             supabase.table("donors").update({"donor_types": types + ["organ"]}).eq("id", body.donor_id).execute()
+            donor_profiles.pop(body.donor_id)
 
     return {
         "success":        True,
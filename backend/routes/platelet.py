@@ -9,6 +9,8 @@ Fixes:
   5. Urgency filtering support
 """
 
+import heapq
+import time
 from datetime import datetime, timezone
 from typing import Optional
 
@@ -16,7 +18,7 @@ from fastapi import APIRouter, Query, HTTPException, Header
 from pydantic import BaseModel
 
 from utils.db import supabase
-from utils.matching import blood_compatible, days_since
+from utils.matching import COMPAT, days_since
 from datetime import date
 
 router = APIRouter()
@@ -64,7 +66,7 @@ def get_open_platelet_requests(
         query = query.eq("blood_group", blood_group)
 
     res = query.execute()
-    now = datetime.now(timezone.utc)
+    now_ts = time.time()
 
     # Determine if requester is a hospital (sees real names)
     role = _get_user_role(user_id)
@@ -76,15 +78,13 @@ def get_open_platelet_requests(
 
         # ── Life Window calculation ──
         expiry_raw = r.get("expiry_date") or r.get("created_at")
-        expiry_dt  = datetime.fromisoformat(expiry_raw.replace("Z", "+00:00"))
+        expiry_ts  = datetime.fromisoformat(expiry_raw).timestamp()
 
-        # If we only have created_at, add 5 days
+        # If we only have created_at, add the viability window
         if not r.get("expiry_date"):
-            from datetime import timedelta
-            expiry_dt = expiry_dt + timedelta(days=5)
+            expiry_ts += PLATELET_VIABILITY_HOURS * 3600
 
-        delta      = expiry_dt - now
-        total_secs = delta.total_seconds()
+        total_secs = expiry_ts - now_ts
         hours_left = max(0, int(total_secs / 3600))
         days_left  = max(0, int(total_secs / 86400))
         d, h       = divmod(hours_left, 24)
@@ -130,18 +130,19 @@ def get_platelet_donors(
 
     results = []
     today = date.today()
+    accepted = COMPAT.get(blood_group, frozenset())
 
     for d in (res.data or []):
         if "platelet" not in (d.get("donor_types") or []):
             continue
         if blood_group and d.get("blood_group"):
-            if not blood_compatible(d["blood_group"], blood_group):
+            if d["blood_group"] not in accepted:
                 continue
         if city and d.get("city"):
             if city.lower() not in d["city"].lower():
                 continue
 
-        since = days_since(d.get("last_donation_date"))
+        since = days_since(d.get("last_donation_date"), today)
         days_unavail = max(0, 14 - since) if since is not None else 0
         if days_unavail == 0:
             next_avail = "Today"
@@ -166,8 +167,7 @@ def get_platelet_donors(
             "city":          d.get("city") or "",
         })
 
-    results.sort(key=lambda x: -x["compat"])
-    return results[:limit]
+    return heapq.nlargest(limit, results, key=lambda x: x["compat"])
 
 
 # ── POST /platelet/requests ───────────────────────────────────────────────────
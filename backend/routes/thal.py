@@ -22,7 +22,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
 from utils.db import supabase
-from utils.matching import days_until, countdown_label, blood_compatible
+from utils.matching import days_until, countdown_label, compatible_donor_groups
 
 router = APIRouter()
 
@@ -53,37 +53,27 @@ def get_thal_patients(hospital_id: Optional[str] = None):
     res = query.execute()
     patients = res.data or []
 
+    # ── Match summary per patient, aggregated in Postgres (one row each) ─────
+    summary_by_patient: dict[str, dict] = {}
+    patient_ids = [p["id"] for p in patients]
+    if patient_ids:
+        match_res = supabase.rpc("thal_match_summary", {"p_patient_ids": patient_ids}).execute()
+        summary_by_patient = {row["patient_id"]: row for row in (match_res.data or [])}
+
     result = []
+    today = date.today()
     for p in patients:
         hospital  = p.get("hospitals") or {}
         next_date = p.get("next_transfusion_date")
-        due_days  = days_until(next_date)
+        due_days  = days_until(next_date, today)
         freq      = p.get("transfusion_frequency_days") or 21
+        summary   = summary_by_patient.get(p["id"], {})
+
+        # ── Current assigned / fulfilled donor (newest first) ────────────────
+        donor_name = summary.get("donor_name") or "Unmatched"
 
-        # ── Current assigned / fulfilled donor ───────────────────────────────
-        match = supabase.table("matches") \
-            .select("donor_id, donors(name)") \
-            .eq("request_id", p["id"]) \
-            .eq("module", "thal") \
-            .eq("status", "fulfilled") \
-            .order("created_at", desc=True) \
-            .limit(1) \
-            .execute()
-
-        donor_name = "Unmatched"
-        if match.data:
-            donor_info = match.data[0].get("donors")
-            if donor_info:
-                donor_name = donor_info.get("name", "Unmatched")
-
-        # ── Collect ALL past donors for this patient (no-repeat rule) ────────
-        past = supabase.table("matches") \
-            .select("donor_id") \
-            .eq("request_id", p["id"]) \
-            .eq("module", "thal") \
-            .execute()
-
-        past_donor_ids = list({row["donor_id"] for row in (past.data or []) if row.get("donor_id")})
+        # ── ALL past donors for this patient (no-repeat rule) ────────────────
+        past_donor_ids = summary.get("past_donor_ids") or []
 
         # ── needs_match_now: 7 days or less until next transfusion ───────────
         needs_match_now = (
@@ -155,23 +145,24 @@ def get_thal_matches(patient_id: str):
         row["donor_id"] for row in (past_res.data or []) if row.get("donor_id")
     }
 
-    # 4. Pull all available, verified donors
-    donors_res = supabase.table("donors") \
+    # 4. Pull available, verified, blood-compatible donors — previously used
+    #    donors are excluded in the query itself (no-repeat rule), so only the
+    #    eligible slice leaves the database
+    donors_query = supabase.table("donors") \
         .select("id, name, blood_group, city, trust_score, is_verified, lat, lng") \
         .eq("is_available", True) \
         .eq("is_verified", True) \
-        .execute()
+        .in_("blood_group", compatible_donor_groups(blood_group))
+
+    if used_donor_ids:
+        donors_query = donors_query.not_.in_("id", list(used_donor_ids))
 
-    donors = donors_res.data or []
+    donors = donors_query.execute().data or []
 
-    # 5. Filter: blood compatible AND not previously used for THIS patient
+    # 5. Shape for the frontend
     eligible = []
     for d in donors:
         donor_id = d["id"]
-        if donor_id in used_donor_ids:
-            continue                          # ← no-repeat rule
-        if not blood_compatible(d.get("blood_group", ""), blood_group):
-            continue
         eligible.append({
             "donor_id":    donor_id,
             "name":        d["name"],
@@ -47,6 +47,9 @@ create table if not exists otp_store (
   created_at timestamptz default now()
 );
 
+-- Lookups go through the mobile primary key; this one serves the purge job below
+create index if not exists otp_store_created_at_idx on otp_store (created_at);
+
 -- ── BloodBridge ───────────────────────────────────────────────────────────────
 
 create table if not exists blood_requests (
@@ -61,6 +64,42 @@ create table if not exists blood_requests (
   created_at   timestamptz default now()
 );
 
+-- (recipient, donor) compatibility matrix, mirroring _COMPATIBLE in
+-- utils/matching.py, so donor lookups can join on it in SQL
+create table if not exists blood_compat (
+  recipient_group text not null,
+  donor_group     text not null,
+  primary key (recipient_group, donor_group)
+);
+
+insert into blood_compat (recipient_group, donor_group) values
+  ('A+',  'A+'), ('A+',  'A-'), ('A+',  'O+'), ('A+',  'O-'),
+  ('A-',  'A-'), ('A-',  'O-'),
+  ('B+',  'B+'), ('B+',  'B-'), ('B+',  'O+'), ('B+',  'O-'),
+  ('B-',  'B-'), ('B-',  'O-'),
+  ('AB+', 'A+'), ('AB+', 'A-'), ('AB+', 'B+'), ('AB+', 'B-'),
+  ('AB+', 'AB+'), ('AB+', 'AB-'), ('AB+', 'O+'), ('AB+', 'O-'),
+  ('AB-', 'A-'), ('AB-', 'B-'), ('AB-', 'AB-'), ('AB-', 'O-'),
+  ('O+',  'O+'), ('O+',  'O-'),
+  ('O-',  'O-')
+on conflict do nothing;
+
+-- Per-group counts for GET /blood/shortage (get_blood_shortage below); the
+-- donors one also serves the compatible-group filter in GET /blood/donors and
+-- the POST /blood/requests fan-out
+create index if not exists blood_requests_open_group_idx on blood_requests (blood_group) where status = 'open';
+create index if not exists donors_available_group_idx on donors (blood_group) where is_available;
+
+-- Newest open requests first — GET /blood/requests/open and /requests/for-donor
+create index if not exists blood_requests_open_created_idx on blood_requests (created_at desc) where status = 'open';
+-- GET /blood/donors?pincode=
+create index if not exists donors_available_pincode_idx on donors (pincode) where is_available;
+-- GET /blood/donors?city= (case-insensitive substring match via ilike)
+create extension if not exists pg_trgm;
+create index if not exists donors_city_trgm_idx on donors using gin (city gin_trgm_ops);
+-- hospital → requests lookups (dashboards, the hospitals embed)
+create index if not exists blood_requests_hospital_idx on blood_requests (hospital_id);
+
 -- ── ThalCare ─────────────────────────────────────────────────────────────────
 
 create table if not exists thal_patients (
@@ -173,6 +212,209 @@ create table if not exists matches (
   created_at  timestamptz default now()
 );
 
+-- ── Materialized Views ────────────────────────────────────────────────────────
+
+-- Open requests vs available donors per blood group, backing GET /blood/shortage.
+-- Refreshed by the refresh-blood-shortage job (Scheduled Jobs below); the
+-- unique index is what lets that refresh run CONCURRENTLY without blocking reads.
+create materialized view if not exists mv_blood_shortage as
+  with reqs as (
+    select br.blood_group as grp, count(*)::int as n
+    from blood_requests br
+    where br.status = 'open'
+    group by br.blood_group
+  ), avail as (
+    select d.blood_group as grp, count(*)::int as n
+    from donors d
+    where d.is_available and coalesce(d.blood_group, '') <> ''
+    group by d.blood_group
+  )
+  select
+    coalesce(reqs.grp, avail.grp) as blood_group,
+    coalesce(reqs.n, 0)           as requests,
+    coalesce(avail.n, 0)          as donors_available
+  from reqs
+  full outer join avail on avail.grp = reqs.grp;
+
+create unique index if not exists mv_blood_shortage_group_idx on mv_blood_shortage (blood_group);
+
+-- ── RPC Functions ─────────────────────────────────────────────────────────────
+
+-- GET /stats — all LiveCounter totals in a single round-trip.
+-- hospitals / matches use planner row estimates (kept fresh by autovacuum's
+-- ANALYZE) so the cost stays O(1) as they grow; the available-donor filter is
+-- selective, so that one stays an exact count.
+create or replace function platform_stats_estimate()
+returns table(donors bigint, hospitals bigint, matches bigint)
+language sql stable as $$
+  select
+    (select count(*) from donors where is_available),
+    (select greatest(reltuples, 0)::bigint from pg_class where oid = 'public.hospitals'::regclass),
+    (select greatest(reltuples, 0)::bigint from pg_class where oid = 'public.matches'::regclass);
+$$;
+
+-- GET /blood/shortage — served from mv_blood_shortage (Materialized Views
+-- above), so the endpoint reads at most 8 pre-aggregated rows.
+create or replace function get_blood_shortage()
+returns table(blood_group text, requests int, donors_available int)
+language sql stable as $$
+  select blood_group, requests, donors_available from mv_blood_shortage;
+$$;
+
+-- POST /blood/requests — in-app notification for every available donor in
+-- the compatible groups, written entirely inside Postgres (no donor rows
+-- round-trip through the API). Returns how many were notified.
+create or replace function notify_compatible_donors(p_groups text[], p_title text, p_message text)
+returns int
+language sql volatile as $$
+  with inserted as (
+    insert into notifications (user_id, title, message, type, module, is_read)
+    select d.id, p_title, p_message, 'blood_request', 'blood', false
+    from donors d
+    where d.is_available and d.blood_group = any(p_groups)
+    returning 1
+  )
+  select count(*)::int from inserted;
+$$;
+
+-- POST /blood/requests — SMS targets: the most trusted available donors with
+-- a mobile whose group can give to p_recipient. Only p_limit rows come back.
+create or replace function compatible_sms_targets(p_recipient text, p_limit int default 5)
+returns table(mobile text)
+language sql stable as $$
+  select d.mobile
+  from donors d
+  join blood_compat bc on bc.donor_group = d.blood_group
+  where bc.recipient_group = p_recipient
+    and d.is_available
+    and d.mobile is not null
+    and d.mobile <> ''
+  order by d.trust_score desc nulls last
+  limit p_limit;
+$$;
+
+-- POST /auth/otp/send — store (or replace) a mobile's OTP, stamping
+-- created_at on the database clock so expiry never depends on app servers.
+create or replace function store_otp(p_mobile text, p_otp text)
+returns void
+language sql volatile as $$
+  insert into otp_store (mobile, otp, created_at)
+  values (p_mobile, p_otp, now())
+  on conflict (mobile) do update
+    set otp = excluded.otp, created_at = excluded.created_at;
+$$;
+
+-- POST /auth/otp/verify — match + expiry check + delete in one atomic
+-- statement (no select-then-delete race, one round-trip).
+create or replace function verify_and_consume_otp(p_mobile text, p_otp text)
+returns boolean
+language sql volatile as $$
+  with consumed as (
+    delete from otp_store
+    where mobile = p_mobile
+      and otp = p_otp
+      and created_at > now() - interval '10 minutes'
+    returning 1
+  )
+  select exists (select 1 from consumed);
+$$;
+
+-- GET /milk/donors — "N babies fed": fulfilled milk matches per donor,
+-- counted here so the result is one row per donor (never cut by max_rows).
+create or replace function milk_fed_counts(p_donor_ids uuid[])
+returns table(donor_id uuid, fed int)
+language sql stable as $$
+  select m.donor_id, count(*)::int
+  from matches m
+  where m.module = 'milk'
+    and m.status = 'fulfilled'
+    and m.donor_id = any(p_donor_ids)
+  group by m.donor_id;
+$$;
+
+-- GET /thal/patients — per patient: the newest fulfilled donor's name and every
+-- donor ever matched (the no-repeat history), one row per patient.
+create or replace function thal_match_summary(p_patient_ids uuid[])
+returns table(patient_id uuid, donor_name text, past_donor_ids uuid[])
+language sql stable as $$
+  select
+    m.request_id,
+    (
+      select d.name
+      from matches f
+      join donors d on d.id = f.donor_id
+      where f.module = 'thal' and f.request_id = m.request_id and f.status = 'fulfilled'
+      order by f.created_at desc
+      limit 1
+    ),
+    coalesce(array_agg(distinct m.donor_id) filter (where m.donor_id is not null), '{}')
+  from matches m
+  where m.module = 'thal'
+    and m.request_id = any(p_patient_ids)
+  group by m.request_id;
+$$;
+
+-- ── Views ─────────────────────────────────────────────────────────────────────
+
+-- POST /auth/login — donor / hospital profile keyed by login email, so the
+-- profile can be fetched in parallel with sign-in instead of after it.
+-- Exposes auth.users data: service role only.
+create or replace view user_with_profile as
+select
+  u.id,
+  lower(u.email) as email,
+  case when d.id is not null then jsonb_build_object(
+    'name', d.name, 'city', d.city, 'blood_group', d.blood_group,
+    'trust_score', d.trust_score, 'is_verified', d.is_verified,
+    'donor_types', d.donor_types
+  ) end as donor,
+  case when h.id is not null then jsonb_build_object(
+    'name', h.name, 'city', h.city, 'is_verified', h.is_verified
+  ) end as hospital
+from auth.users u
+left join donors d on d.id = u.id
+left join hospitals h on h.id = u.id;
+
+revoke all on user_with_profile from anon, authenticated;
+
+-- GET /dashboard/donor/{id} — open blood and platelet requests in one feed.
+-- module_rank numbers each module's rows newest-first, so a single
+-- `module_rank <= n` filter returns the latest n of both in one round-trip.
+create or replace view v_urgent_requests with (security_invoker = true) as
+select
+  u.*,
+  row_number() over (partition by u.module order by u.created_at desc) as module_rank
+from (
+  select id, 'blood' as module, blood_group, urgency, hospital_id, created_at
+  from blood_requests
+  where status = 'open'
+  union all
+  select id, 'platelet' as module, blood_group, urgency, hospital_id, created_at
+  from platelet_requests
+  where status = 'open'
+) u;
+
+-- ── Scheduled Jobs ────────────────────────────────────────────────────────────
+-- Needs the pg_cron extension (Dashboard → Database → Extensions).
+
+create extension if not exists pg_cron;
+
+-- Expired OTPs are already rejected by verify_and_consume_otp(); this only
+-- keeps otp_store from growing with codes that were never verified.
+select cron.schedule(
+  'purge-expired-otps',
+  '0 * * * *',
+  $$delete from otp_store where created_at < now() - interval '1 hour'$$
+);
+
+-- Keeps mv_blood_shortage within a minute of live data; the API additionally
+-- caches the result for SHORTAGE_TTL_SECONDS per worker.
+select cron.schedule(
+  'refresh-blood-shortage',
+  '* * * * *',
+  $$refresh materialized view concurrently mv_blood_shortage$$
+);
+
 -- ── Enable Realtime for live-updating pages ───────────────────────────────────
 
 alter publication supabase_realtime add table blood_requests;
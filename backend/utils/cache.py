@@ -0,0 +1,66 @@
+"""
+utils/cache.py
+--------------
+Small in-process caches — per worker, no cross-worker sharing.
+  • TTLCache          — thread-safe bounded LRU; entries optionally expire after `ttl` seconds
+  • donor_profiles    — donors rows by id, read by the donor dashboard
+  • hospital_profiles — hospitals rows by id, read by the hospital dashboard
+
+Routes that update a donor or hospital row pop its id, but only in the worker
+that handled the write — other workers keep their copy until the TTL runs out.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    LRU cache with an optional per-entry time-to-live (monotonic clock).
+    ttl=None keeps entries until they are evicted by size.
+
+    Sync routes call this from threadpool threads while async routes call it
+    on the event loop, so every operation holds a lock.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if time.monotonic() >= expires:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+# Profiles change rarely (verification, new donor type). Write paths pop the
+# entry in their own worker only; with several uvicorn workers the others serve
+# the old row for up to PROFILE_CACHE_TTL_SECONDS, which bounds staleness.
+PROFILE_CACHE_SIZE        = 10_000
+PROFILE_CACHE_TTL_SECONDS = 30.0
+
+donor_profiles    = TTLCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL_SECONDS)
+hospital_profiles = TTLCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL_SECONDS)
@@ -1,4 +1,6 @@
 import os
+from functools import lru_cache
+
 from dotenv import load_dotenv
 from supabase import create_client
 
@@ -10,4 +12,36 @@ load_dotenv(dotenv_path=ENV_PATH)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+@lru_cache(maxsize=1)
+def get_supabase_client():
+    """Process-wide Supabase client — one long-lived HTTP session per worker."""
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+
+supabase = get_supabase_client()
+
+# Optional direct Postgres DSN for hot read paths (asyncpg). When unset, every
+# route keeps using the PostgREST client above.
+#
+# Point this at a transaction-mode pooler rather than Postgres itself, e.g.
+# PgBouncer (POOL_MODE=transaction, port 6432) or Supabase's pooler (port 6543),
+# so all workers share a small set of server connections.
+DATABASE_URL = os.getenv("DATABASE_URL")
+PG_POOL_MIN  = int(os.getenv("PG_POOL_MIN", "2"))
+PG_POOL_MAX  = int(os.getenv("PG_POOL_MAX", "10"))
+
+
+async def create_pg_pool():
+    """Create the asyncpg pool used by hot read paths, or None if DATABASE_URL is unset."""
+    if not DATABASE_URL:
+        return None
+    import asyncpg
+    # Transaction pooling hands each transaction to an arbitrary server
+    # connection, so server-side prepared statements can't be cached.
+    return await asyncpg.create_pool(
+        DATABASE_URL,
+        min_size=PG_POOL_MIN,
+        max_size=PG_POOL_MAX,
+        statement_cache_size=0,
+    )
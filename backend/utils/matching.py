@@ -2,15 +2,21 @@
 utils/matching.py
 -----------------
 Pure helper functions — no DB calls here.
-  • blood_compatible()  — can donor_group donate to recipient_group?
+  • blood_compatible()  — can donor_group donate to recipient_group? (BLOOD_COMPATIBLE_PAIRS)
+  • COMPAT / CAN_DONATE_TO — per-group frozensets for loops with one side fixed
+  • compatible_donor_groups() — donor groups a recipient can accept (for SQL `in` filters)
   • hla_score()         — Jaccard similarity for bone marrow HLA matching
   • haversine()         — km distance between two lat/lng points
+  • haversine_many()    — km distances from one point to arrays of points (NumPy)
   • days_since()        — days since an ISO date string
+  • days_since_many()   — days since each of many ISO date strings (NumPy)
 """
 
 import math
 from datetime import date, datetime
-from typing import Optional
+from typing import Collection, Optional
+
+import numpy as np
 
 
 # ── Blood Compatibility ───────────────────────────────────────────────────────
@@ -26,25 +32,54 @@ _COMPATIBLE: dict[str, list[str]] = {
     "O-":  ["O-"],
 }
 
+# Every compatible (donor, recipient) pair — a single hash probe per check.
+# Hot loops can test `(donor, recipient) in BLOOD_COMPATIBLE_PAIRS` directly.
+BLOOD_COMPATIBLE_PAIRS: frozenset[tuple[str, str]] = frozenset(
+    (donor, recipient) for recipient, donors in _COMPATIBLE.items() for donor in donors
+)
+
+
+# Per-group views of the same matrix, for loops where one side is fixed:
+#   COMPAT[recipient]       → donor groups it can accept
+#   CAN_DONATE_TO[donor]    → recipient groups it can give to
+# Hoist the lookup out of the loop, then test `group in that_set` per row.
+COMPAT: dict[str, frozenset[str]] = {
+    recipient: frozenset(donors) for recipient, donors in _COMPATIBLE.items()
+}
+CAN_DONATE_TO: dict[str, frozenset[str]] = {
+    donor: frozenset(r for r, donors in _COMPATIBLE.items() if donor in donors)
+    for donor in _COMPATIBLE
+}
+
+
 def blood_compatible(donor_group: str, recipient_group: str) -> bool:
     """Returns True if donor can donate to recipient."""
-    return donor_group in _COMPATIBLE.get(recipient_group, [])
+    return (donor_group, recipient_group) in BLOOD_COMPATIBLE_PAIRS
+
+
+def compatible_donor_groups(recipient_group: str) -> list[str]:
+    """Donor blood groups that can give to recipient_group ([] if unknown)."""
+    return list(_COMPATIBLE.get(recipient_group, []))
 
 
 # ── HLA Jaccard Score ─────────────────────────────────────────────────────────
-def hla_score(donor_hla: list[str], patient_hla: list[str]) -> float:
+def hla_score(donor_hla: Collection[str], patient_hla: Collection[str]) -> float:
     """
     Jaccard similarity × 100, rounded to 1 decimal.
     e.g. ["A*02:01","B*07:02"] vs ["A*02:01","B*08:01"] → 33.3
+
+    When scoring many donors against one patient, pass patient_hla as a
+    frozenset so it is built once rather than per donor.
     """
     if not donor_hla or not patient_hla:
         return 0.0
     d = set(donor_hla)
-    p = set(patient_hla)
-    union = d | p
+    p = patient_hla if isinstance(patient_hla, (set, frozenset)) else set(patient_hla)
+    shared = len(d & p)
+    union  = len(d) + len(p) - shared
     if not union:
         return 0.0
-    return round(len(d & p) / len(union) * 100, 1)
+    return round(shared / union * 100, 1)
 
 
 def hla_confidence(score: float) -> str:
@@ -69,25 +104,45 @@ def haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     return round(R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)), 1)
 
 
+def haversine_many(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Vectorised haversine() from one point to many; NaN coordinates give NaN."""
+    R = 6371.0
+    phi1, phi2 = math.radians(lat), np.radians(lats)
+    dphi = np.radians(lats - lat)
+    dlam = np.radians(lngs - lng)
+    a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+    return np.round(R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)), 1)
+
+
 # ── Date Helpers ──────────────────────────────────────────────────────────────
-def days_since(iso_date: Optional[str]) -> Optional[int]:
-    """Returns days since the given ISO date string, or None."""
+def days_since(iso_date: Optional[str], today: Optional[date] = None) -> Optional[int]:
+    """Returns days since the given ISO date string, or None.
+
+    Pass `today` when calling in a loop so the clock is read once per request.
+    """
     if not iso_date:
         return None
     try:
         d = datetime.fromisoformat(iso_date[:10]).date()
-        return (date.today() - d).days
+        return ((today or date.today()) - d).days
     except Exception:
         return None
 
 
-def days_until(iso_date: Optional[str]) -> Optional[int]:
+def days_since_many(iso_dates: list[Optional[str]], today: Optional[date] = None) -> np.ndarray:
+    """Vectorised days_since() — float days, NaN where the date is missing."""
+    dates = np.array([(d or "NaT")[:10] for d in iso_dates], dtype="datetime64[D]")
+    elapsed = (np.datetime64(today or date.today(), "D") - dates).astype(np.float64)
+    return np.where(np.isnat(dates), np.nan, elapsed)
+
+
+def days_until(iso_date: Optional[str], today: Optional[date] = None) -> Optional[int]:
     """Returns days until the given ISO date string (negative = overdue), or None."""
     if not iso_date:
         return None
     try:
         d = datetime.fromisoformat(iso_date[:10]).date()
-        return (d - date.today()).days
+        return (d - (today or date.today())).days
     except Exception:
         return None
 
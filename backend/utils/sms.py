@@ -7,10 +7,29 @@ so the rest of the app works fine without SMS configured.
 
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Optional
 
 log = logging.getLogger(__name__)
 
+# Twilio calls are network-bound, so a handful of threads sends a batch in
+# roughly the time of one message. Shared so each alert doesn't spin up its own.
+SMS_WORKERS = 8
+_sms_pool = ThreadPoolExecutor(max_workers=SMS_WORKERS, thread_name_prefix="sms")
+
+
+@lru_cache(maxsize=1)
+def _twilio_client(sid: str, token: str):
+    """Build the Twilio client on first use and reuse it (and its HTTP session) afterwards."""
+    from twilio.rest import Client
+    return Client(sid, token)
+
+
+def sms_configured() -> bool:
+    """True when Twilio credentials are present, i.e. send_sms() will attempt delivery."""
+    return all(os.getenv(k) for k in ("TWILIO_SID", "TWILIO_TOKEN", "TWILIO_FROM"))
+
 
 def send_sms(to: str, body: str) -> bool:
     """
@@ -26,8 +45,7 @@ def send_sms(to: str, body: str) -> bool:
         return False
 
     try:
-        from twilio.rest import Client
-        client = Client(sid, token)
+        client = _twilio_client(sid, token)
         message = client.messages.create(body=body, from_=from_, to=to)
         log.info("SMS sent to %s: SID=%s", to, message.sid)
         return True
@@ -37,5 +55,8 @@ def send_sms(to: str, body: str) -> bool:
 
 
 def alert_donors(mobiles: list[str], message: str) -> int:
-    """Send SMS to a list of mobiles. Returns count of successes."""
-    return sum(send_sms(m, message) for m in mobiles if m)
\ No newline at end of file
+    """Send SMS to a list of mobiles concurrently. Returns count of successes."""
+    targets = [m for m in mobiles if m]
+    if len(targets) <= 1:
+        return sum(send_sms(m, message) for m in targets)
+    return sum(_sms_pool.map(lambda m: send_sms(m, message), targets))
\ No newline at end of file